@@ -70,7 +70,7 @@ def show(provider,
 def is_starnames(arr):
     return type(arr[0])==np.str_
 def array_only_fill_values(arr):
-    return len(arr[np.where(arr!=1e20)])==0
+    return not np.any(arr!=1e20)
 def remove_fill_values(arr):
     return arr[np.where(arr!=1e20)]
 
@@ -1,13 +1,14 @@
 """ Combines the data from the individual data providers. """
 
 import numpy as np #arrays
-from astropy.table import Column, join, column, vstack, Table, unique
+from astropy.table import Column, MaskedColumn, join, column, vstack, Table, unique
 from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 
 #self created modules
 from utils.io import save, Path
-from provider.utils import nullvalues, replace_value
+from provider.utils import nullvalues, replace_value, unique_rows
 from sdata import empty_cat, empty_provider_tables_dict,empty_cat_wit_columns,paras_dict
 
 def idsjoin(cat,column_ids1,column_ids2):
@@ -26,27 +27,23 @@ def idsjoin(cat,column_ids1,column_ids2):
     :rtype: astropy.table.table.Table
     """
     
-    cat['ids']=Column(dtype=object, length=len(cat))
     for column in [column_ids1,column_ids2]:
         cat=nullvalues(cat,column,'')
-    for i in range(len(cat)):
-        # splitting object into list of elements
-        ids1=cat[column_ids1][i].split('|')
-        ids2=cat[column_ids2][i].split('|')
-        if ids2==['']:
-            cat['ids'][i]=cat[column_ids1][i]
-        elif ids1==['']:
-            cat['ids'][i]=cat[column_ids2][i]
+    #iterating over plain object arrays avoids the per cell table access
+    ids1=np.asarray(cat[column_ids1],dtype=object)
+    ids2=np.asarray(cat[column_ids2],dtype=object)
+    merged=[]
+    for first,second in zip(ids1,ids2):
+        if second=='':
+            merged.append(first)
+        elif first=='':
+            merged.append(second)
         else:
-            ids=ids1+ids2#should be list
-            #removing double entries
-            ids=set(ids)
-            #changing type back into list
-            ids=list(ids)
-            #joining list into object with elements separated by |
-            ids="|".join(ids)
-            cat['ids'][i]=ids
-        cat['ids'][i]=cat['ids'][i].strip('|')
+            #removing double entries while keeping the order of appearance
+            merged.append('|'.join(dict.fromkeys(
+                    first.split('|')+second.split('|'))))
+    cat['ids']=Column(np.char.strip(np.array(merged,dtype=str),'|'),
+                      dtype=object)
     return cat
 
 def objectmerging(cat):
@@ -68,15 +65,10 @@ def objectmerging(cat):
     #merging types
     #initializing column
     if 'type' not in cat.colnames:#----------
-        cat['type']=Column(dtype=object, length=len(cat))
-        cat['type_1']=cat['type_1'].astype(object)
-        cat['type_2']=cat['type_2'].astype(object)
-        for i in range(len(cat)):
-            if type(cat['type_2'][i])==np.ma.core.MaskedConstant or \
-                    cat['type_2'][i]=='None':
-                cat['type'][i]=cat['type_1'][i]
-            else:
-                cat['type'][i]=cat['type_2'][i]
+        #type_2 is used unless it is masked or 'None'
+        no_type_2=np.ma.filled(cat['type_2'].astype(object),'None')=='None'
+        cat['type']=Column(np.where(no_type_2,cat['type_1'],cat['type_2']),
+                           dtype=object)
         cat.remove_columns(['type_1','type_2'])
     return cat
 
@@ -95,6 +87,10 @@ def assign_source_idref(cat,sources,paras,provider):
     :returns: Astropy table containing para_source_id data.
     :rtype: astropy.table.table.Table
     """
+    #ref to source_id mapping of this provider, built once for all parameters
+    provider_sources=sources[sources['provider_name']==provider]
+    source_idrefs=dict(zip(np.asarray(provider_sources['ref']).astype(str),
+                           np.asarray(provider_sources['source_id'])))
     #for all parameters specified
     for para in paras:
         #if they have reference columns
@@ -104,22 +100,18 @@ def assign_source_idref(cat,sources,paras,provider):
                 cat.remove_column(f'{para}_source_idref')
             #if those reference columns are masked
             cat=nullvalues(cat,para+'_ref','None')
-            #join to each reference parameter its source_id
-            cat=join(cat,sources['ref','source_id'][np.where(
-                            sources['provider_name']==provider)],
-                            keys_left=para+'_ref',keys_right='ref',
-                            join_type='left')
-            #renaming column to specify to which parameter the source_id
-            # correspond
-            cat.rename_column('source_id',f'{para}_source_idref')
-            #deleting double column containing reference information
-            cat.remove_columns('ref')
+            #look up to each reference parameter its source_id, references
+            #without source stay masked as in a left join
+            refs=np.asarray(cat[para+'_ref']).astype(str)
+            found=np.array([ref in source_idrefs for ref in refs],dtype=bool)
+            cat[f'{para}_source_idref']=MaskedColumn(
+                    [source_idrefs.get(ref,0) for ref in refs],
+                    dtype=sources['source_id'].dtype,mask=np.invert(found))
             #in case the para_value entry is masked this if environment
             # will put the source_id entry to null
             if para+'_value' in cat.colnames:
                 if type(cat[para+'_value'])==column.MaskedColumn:
-                    for i in cat[para+'_value'].mask.nonzero()[0]:
-                        cat[f'{para}_source_idref'][i]=999999
+                    cat[f'{para}_source_idref'][cat[para+'_value'].mask]=999999
     return cat
 
 def merge_table(cat1,cat2):
@@ -149,16 +141,19 @@ def best_para_id(mes_table):
     para='id'
     best_para_table=mes_table[:0].copy()
     grouped_mes_table=mes_table.group_by('id_ref')
+    #groups.keys builds a new table on each access, looking it up once
+    groups=grouped_mes_table.groups
+    group_refs=groups.keys['id_ref']
     #making simbad default best para
-    mask = grouped_mes_table.groups.keys['id_ref'] == '2000A&AS..143....9W' 
-    best_para_table=grouped_mes_table.groups[mask]
+    mask = group_refs == '2000A&AS..143....9W' 
+    best_para_table=groups[mask]
     # TBD: use id_ref as variable from provider_bibcode 
     #        instad of constant""")
     for ref in ['2022A&A...664A..21Q','2016A&A...595A...1G','priv. comm.',
                 '2020A&C....3100370A','2001AJ....122.3466M']:
         #priority of id best para: 
-        mask = grouped_mes_table.groups.keys['id_ref'] == ref
-        all_ref_ids=grouped_mes_table.groups[mask]
+        mask = group_refs == ref
+        all_ref_ids=groups[mask]
         #removing those already in best_para_table
         new_ids=all_ref_ids[np.where(np.invert(np.in1d(
                                     all_ref_ids['id'],
@@ -169,31 +164,57 @@ def best_para_id(mes_table):
 
 def best_para_membership(mes_table):
     para='membership'
-    best_para_table=mes_table[:0].copy()
-    grouped_mes_table=mes_table.group_by(['child_object_idref',
-                                          'parent_object_idref'])
-    ind=grouped_mes_table.groups.indices
-    for i in range(len(ind)-1):
-        l=ind[i+1]-ind[i]
-        if l==1:
-            best_para_table.add_row(grouped_mes_table[ind[i]])
-        else:
-            temp=grouped_mes_table[ind[i]:ind[i+1]]
-            not_nan_temp=temp[np.where(temp[para]!=999999)]
-            if len(not_nan_temp)>0:
-                max_row=not_nan_temp[np.where(
-                        not_nan_temp[para]==max(not_nan_temp[para]))]
-                for j in range(ind[i],ind[i+1]):
-                    if grouped_mes_table[para][j]==max(not_nan_temp[para]):
-                        best_para_table.add_row(grouped_mes_table[j])
-                        break # make sure not multiple of same max 
-                               # value are added
-            else:
-                #if none of the objects has a membership entry 
-                # then pick just first one
-                best_para_table.add_row(grouped_mes_table[ind[i]])
+    membership=np.ma.filled(mes_table[para],999999)
+    #highest membership first, 999999 (no membership entry) only if nothing
+    #else is available
+    rank=np.where(membership==999999,np.inf,-membership.astype(float))
+    #stable sort by object pair and rank, the first row of each pair is
+    #then the first row with the maximum membership
+    order=np.lexsort((rank,mes_table['parent_object_idref'],
+                      mes_table['child_object_idref']))
+    child=np.asarray(mes_table['child_object_idref'])[order]
+    parent=np.asarray(mes_table['parent_object_idref'])[order]
+    first=np.ones(len(order),dtype=bool)
+    first[1:]=(child[1:]!=child[:-1]) | (parent[1:]!=parent[:-1])
+    best_para_table=mes_table[order[first]]
     return best_para_table
 
+#parameters with their own selection logic
+best_para_functions = {
+    'id': best_para_id,
+    'membership': best_para_membership
+}
+
+#column suffixes of parameters deviating from value, err, qual, source_idref
+best_para_suffixes = {
+    'binary': ['_flag','_qual','_source_idref'],
+    'mass_pl': ['_value','_rel','_err','_qual','_source_idref'],
+    'sep_ang': ['_value','_err','_obs_date','_qual','_source_idref']
+}
+
+#quality flags from best to worst
+quality_order = ['A','B','C','D','E','?']
+#rank of each quality, qualities not in quality_order get len(quality_order)
+quality_code={qual: i for i,qual in enumerate(quality_order)}
+
+def quality_codes(quals):
+    """
+    Converts a quality column into int8 codes of its rank in quality_order.
+    
+    The lookup is done once per distinct quality instead of once per row.
+    
+    :param quals: Quality column e.g. para+'_qual'.
+    :type quals: astropy.table.column.Column
+    :returns: Rank of the quality, len(quality_order) for unknown or masked
+        qualities.
+    :rtype: numpy.ndarray
+    """
+    quals=np.ma.filled(quals,'').astype(str)
+    distinct,inverse=np.unique(quals,return_inverse=True)
+    codes=np.array([quality_code.get(qual,len(quality_order))
+                    for qual in distinct],dtype=np.int8)
+    return codes[inverse]
+
 def best_para(para,mes_table):
     """
     This function keeps only highest quality row for each object. 
@@ -210,61 +231,106 @@ def best_para(para,mes_table):
     :rtype: astropy.table.table.Table
     """
     
-    if para=='id':
-        return best_para_id(mes_table)
-    elif para=='membership':
-        return best_para_membership(mes_table)
-    elif para=='binary':
-        columns=['main_id',para+'_flag',para+'_qual',para+'_source_idref']
-    elif para=='mass_pl':
-        columns=['main_id',para+'_value',para+'_rel',para+'_err',para+'_qual',
-                para+'_source_idref']
-    elif para=='sep_ang':
-        columns=['main_id',para+'_value',para+'_err',para+'_obs_date',
-                para+'_qual',para+'_source_idref']
-    else:
-        columns=['main_id',para+'_value',para+'_err',para+'_qual',
-                para+'_source_idref']
+    if para in best_para_functions:
+        return best_para_functions[para](mes_table)
+    columns=['main_id']+[para+suffix for suffix in best_para_suffixes.get(
+            para,['_value','_err','_qual','_source_idref'])]
     mes_table=mes_table[columns[0:]]
-    best_para_table=mes_table[columns[0:]][:0].copy()
-    #group mes_table by object (=main_id)
-    grouped_mes_table=mes_table.group_by('main_id')
-    #take highest quality
-    #quite time intensive (few minutes) could maybe be optimized using 
-    # np.in1d function
-    for j in range(len(grouped_mes_table.groups.keys)):
-    # go through all objects
-        for qual in ['A','B','C','D','E','?']:
-            for i in range(len(grouped_mes_table.groups[j])):
-                if grouped_mes_table.groups[j][i][para+'_qual']==qual:
-                    best_para_table.add_row(grouped_mes_table.groups[j][i])
-                    break # if best para found go to next main_id group
-            else:
-                continue # only executed if the inner loop did NOT break
-            break  # only executed if the inner loop DID break 
+    #rank of the quality, rows with other qualities are never selected
+    rank=quality_codes(mes_table[para+'_qual'])
+    main_ids=np.asarray(mes_table['main_id']).astype(str)
+    #objects with exactly one row of the best quality need no sorting by
+    #quality, that row is picked directly
+    best=np.flatnonzero(rank==0)
+    best_ids,best_index,best_counts=np.unique(main_ids[best],
+                                   return_index=True,return_counts=True)
+    picked=best[best_index[best_counts==1]]
+    valid=np.flatnonzero((rank<len(quality_order)) & np.invert(
+            np.isin(main_ids,best_ids[best_counts==1])))
+    #stable sort by object (=main_id) and quality, the first row of each 
+    #remaining object is then its first row of highest quality
+    order=np.lexsort((rank[valid],main_ids[valid]))
+    remaining_ids=main_ids[valid[order]]
+    first=np.ones(len(remaining_ids),dtype=bool)
+    first[1:]=remaining_ids[1:]!=remaining_ids[:-1]
+    rows=np.concatenate((picked,valid[order][first]))
+    #one row per object, sorting by main_id as before
+    rows=rows[np.argsort(main_ids[rows],kind='stable')]
+    best_para_table=mes_table[rows]
     return best_para_table
 
-def best_parameters_ingestion(cat_mes,cat_basic,para,columns=[]):
+def main_id_codes(*main_id_columns):
+    """
+    Interns main identifiers into int32 codes shared by all columns.
+    
+    The codes follow the sort order of the main identifiers.
+    
+    :param main_id_columns: Columns of main identifiers.
+    :type main_id_columns: astropy.table.column.Column
+    :returns: Codes of each column.
+    :rtype: list(numpy.ndarray)
+    """
+    main_ids=[np.asarray(main_id_column).astype(str) 
+              for main_id_column in main_id_columns]
+    codes=np.unique(np.concatenate(main_ids),
+                    return_inverse=True)[1].astype(np.int32)
+    return np.split(codes,np.cumsum([len(ids) for ids in main_ids])[:-1])
+
+def best_parameters_ingestion(best_para_cat_mes,cat_basic,columns=[]):
     """
-    Takes from the multiple measurement table best parameters for basic table.
+    Joins the best parameters of a measurement table into the basic table.
 
-    :para cat_mes:
-    :type cat_mes: astropy.table.table.Table
+    :para best_para_cat_mes: Best parameters as returned by best_para.
+    :type best_para_cat_mes: astropy.table.table.Table
     :para cat_basic:
     :type cat_basic: astropy.table.table.Table
-    :para str para: Parameter name
     :para columns: List of column names of the parameter.
     :type columns: list(str)
     :returns:
     :rtype: astropy.table.table.Table
     """
-    best_para_cat_mes=best_para(para,cat_mes)
     if columns!=[]:
         cat_basic.remove_columns(columns)
-    cat_basic=join(cat_basic,best_para_cat_mes,join_type='left')
+    keys=[colname for colname in cat_basic.colnames 
+          if colname in best_para_cat_mes.colnames]
+    if keys!=['main_id'] or len(best_para_cat_mes)==0:
+        return join(cat_basic,best_para_cat_mes,join_type='left')
+    #left join on main_id through integer codes of the main_ids instead of
+    #hashing the strings, best_para returns one row per main_id
+    basic_codes,best_codes=main_id_codes(cat_basic['main_id'],
+                                         best_para_cat_mes['main_id'])
+    best_row=np.full(max(basic_codes.max(initial=-1),best_codes.max())+1,-1)
+    best_row[best_codes]=np.arange(len(best_codes))
+    #rows sorted by main_id like the join result
+    order=np.argsort(basic_codes,kind='stable')
+    rows=best_row[basic_codes[order]]
+    missing=rows<0
+    cat_basic=cat_basic[order]
+    for colname in best_para_cat_mes.colnames:
+        if colname=='main_id':
+            continue
+        col=best_para_cat_mes[colname][np.where(missing,0,rows)]
+        if np.any(missing):
+            col=MaskedColumn(col,mask=np.ma.getmaskarray(col) | missing)
+        cat_basic[colname]=col
     return cat_basic
 
-def provider_data_merging(cat,table_name,prov_tables_dict,o_merging=False,para_match=False):
+def get_provider_names(prov_tables_dict):
+    """
+    Looks up the provider name of each provider.
+    
+    :param prov_tables_dict: Provider tables of each provider.
+    :type prov_tables_dict: dict(str,dict(str,astropy.table.table.Table))
+    :returns: Provider name of each provider, None if its provider table 
+        is empty.
+    :rtype: dict(str,str)
+    """
+    return {prov_table: (prov_tables_dict[prov_table]['provider'][
+                'provider_name'][0] if len(prov_tables_dict[prov_table][
+                'provider'])>0 else None) for prov_table in prov_tables_dict}
+
+def provider_data_merging(cat,table_name,prov_tables_dict,o_merging=False,
+                          para_match=False,provider_names=None):
     """
     Merges the data from the different providers.
     
@@ -278,26 +344,40 @@ def provider_data_merging(cat,table_name,prov_tables_dict,o_merging=False,para_m
     :type prov_tables_list: list(astropy.table.table.Table)
     :para bool o_merging:
     :para bool para_match:
+    :param provider_names: Provider name of each provider as returned by 
+        provider_names, looked up here if not given.
+    :type provider_names: dict(str,str)
     :returns:
     :rtype: astropy.table.table.Table
     """
     print(f'Building {table_name} table ...')#sources
     
+    #providers with data for this table
+    providers=[prov_table for prov_table in prov_tables_dict.keys() 
+               if len(prov_tables_dict[prov_table][table_name])>0]
+    if para_match:
+        if provider_names is None:
+            provider_names=get_provider_names(prov_tables_dict)
+        for prov_table in providers:
+            #prov_tables_list[j] is a table containing the two columns ref 
+            # and provider name. replacing ref columns with 
+            # corresponding source_idref one. issue is that order 
+            # prov_tables_list and provider_name not the same
+            prov_tables_dict[prov_table][table_name]=assign_source_idref(
+                    prov_tables_dict[prov_table][table_name],cat['sources'],
+                    paras_dict[table_name],provider_names[prov_table])
+    parts=[prov_tables_dict[prov_table][table_name] for prov_table in providers]
+    if not o_merging and len(parts)>1 and all(
+            set(part.colnames)==set(parts[0].colnames) for part in parts):
+        #with identical columns the outer joins only drop rows that are 
+        #identical in all columns, which the callers remove with unique 
+        #afterwards anyway. The joins also sort by all columns, which 
+        #decides the row best_para picks among equal qualities, so the 
+        #stacked rows are sorted the same way
+        cat[table_name]=vstack(parts)
+        cat[table_name].sort(cat[table_name].colnames)
+        return cat
     for prov_table in list(prov_tables_dict.keys()):
-        if para_match:
-            # redefining of paras multiple times is not optimal but easier to 
-            # read the code if I don't have to define them globally or pass
-            # them to the function.
-            #print('careful, I have here hardcoded parameter and table order')
-            paras=paras_dict.copy()
-            if len(prov_tables_dict[prov_table][table_name])>0:
-                #prov_tables_list[j] is a table containing the two columns ref 
-                # and provider name. replacing ref columns with 
-                # corresponding source_idref one. issue is that order 
-                # prov_tables_list and provider_name not the same
-                prov_tables_dict[prov_table][table_name]=assign_source_idref(prov_tables_dict[prov_table][table_name],
-                                        cat['sources'],paras[table_name],
-                                        prov_tables_dict[prov_table]['provider']['provider_name'][0])
         if len(cat[table_name])>0:
             #joining data from different providers (simbad,...,wds)
             if len(prov_tables_dict[prov_table][table_name])>0:
@@ -334,8 +414,7 @@ def unify_null_values(cat):
              ['binary_qual']]
     for i in range(len(tables)):
         for col in columns[i]:
-            tables[i]=replace_value(tables[i],col,'N','?')
-            tables[i]=replace_value(tables[i],col,'N/A','?')
+            tables[i]=replace_value(tables[i],col,['N','N/A'],'?')
     return cat
 
 def build_sources_table(cat,prov_tables_dict,empty):
@@ -347,10 +426,8 @@ def build_sources_table(cat,prov_tables_dict,empty):
     cat['sources']=vstack(
             [cat['sources'],empty['sources']])
     # keeping only unique values then create identifiers for the tables
-    cat['sources']=unique(
-            cat['sources'],silent=True)
-    cat['sources']['source_id']=[j+1 for j \
-            in range(len(cat['sources']))]    
+    cat['sources']=unique_rows(cat['sources'])
+    cat['sources']['source_id']=np.arange(1,len(cat['sources'])+1)
     return cat
 
 def build_objects_table(cat,prov_tables_dict):
@@ -358,8 +435,7 @@ def build_objects_table(cat,prov_tables_dict):
             cat,'objects',prov_tables_dict,o_merging=True)
                     
     #assigning object_id
-    cat['objects']['object_id']=[j+1 for j \
-            in range(len(cat['objects']))]
+    cat['objects']['object_id']=np.arange(1,len(cat['objects'])+1)
     
     # At one point I would like to be able to merge objects with main_id
     # NAME Proxima Centauri b and Proxima Centauri b
@@ -374,116 +450,201 @@ def build_provider_table(cat,prov_tables_dict,empty):
             [cat['provider'],empty['provider']])    
     return cat
 
-def build_rest_of_tables(cat,prov_tables_dict,empty):
-    for table_name in islice(cat,3,None): 
-    # for the tables star_basic,...,mes_mass_st
-        cat=provider_data_merging(cat,table_name,
-                                     prov_tables_dict,para_match=True)
+def fill_masked_columns(cat):
+    """
+    Fills masked entries with the fill value of their column.
+    
+    Same result as Table.filled but only the columns containing masked
+    entries are copied.
+    
+    :param cat: Table with possibly masked columns.
+    :type cat: astropy.table.table.Table
+    :returns: Table cat without masked entries.
+    :rtype: astropy.table.table.Table
+    """
+    for colname in cat.colnames:
+        if np.ma.is_masked(cat[colname]):
+            cat[colname]=cat[colname].filled()
+    return cat
 
-        #I do this to get those columns that are empty in the data
-        
+def object_idrefs(main_ids,object_id_of_main_id):
+    """
+    Looks up the object_id of each main_id.
+    
+    :param main_ids: Main identifiers.
+    :type main_ids: astropy.table.column.Column
+    :param object_id_of_main_id: Mapping of main_id to object_id.
+    :type object_id_of_main_id: dict(str,int)
+    :returns: Object identifiers, masked where the main_id is not in the
+        mapping as in a left join.
+    :rtype: astropy.table.column.MaskedColumn
+    """
+    main_ids=np.asarray(main_ids).astype(str)
+    found=np.array([main_id in object_id_of_main_id for main_id in main_ids],
+                   dtype=bool)
+    return MaskedColumn([object_id_of_main_id.get(main_id,0) for main_id 
+                         in main_ids],dtype=int,mask=np.invert(found))
+
+def build_table(cat,table_name,prov_tables_dict,empty,object_id_of_main_id,
+                object_idref_ids,provider_names):
+    """
+    Builds one of the tables following the objects table.
+    
+    Only reads the tables of cat, the caller stores the returned tables.
+    
+    :param cat: Tables built so far, containing at least sources and 
+        objects.
+    :type cat: dict(str,astropy.table.table.Table)
+    :param str table_name: Name of the table to build.
+    :param prov_tables_dict: Provider tables of each provider.
+    :type prov_tables_dict: dict(str,dict(str,astropy.table.table.Table))
+    :param empty: Empty tables with all columns.
+    :type empty: dict(str,astropy.table.table.Table)
+    :param object_id_of_main_id: Mapping of main_id to object_id.
+    :type object_id_of_main_id: dict(str,int)
+    :param object_idref_ids: Columns object_idref and main_id of objects.
+    :type object_idref_ids: astropy.table.table.Table
+    :param provider_names: Provider name of each provider.
+    :type provider_names: dict(str,str)
+    :returns: Built tables by name, for h_link including best_h_link, and
+        the table the best parameters are selected from.
+    :rtype: tuple(dict(str,astropy.table.table.Table),
+        astropy.table.table.Table)
+    """
+    tables={}
+    #merging into a dict of its own so cat is not modified
+    merged=provider_data_merging({'sources': cat['sources'],
+                                  table_name: cat[table_name]},
+                                 table_name,prov_tables_dict,para_match=True,
+                                 provider_names=provider_names)
+    table=merged[table_name]
+
+    #I do this to get those columns that are empty in the data
+    
+    
+    table=vstack([table,empty[table_name]])
+    #filling so when I run unique it doesn't neglect previously masked columns
+    table=fill_masked_columns(table)
+
+    if 'object_idref' in table.colnames and len(table)>0: 
+        # add object_idref
+        # first remove the object_idref we got from empty 
+        # initialization, the looked up one is appended at the end
+        # like the right hand columns of a join
+        table.remove_column('object_idref') 
+        table['object_idref']=object_idrefs(
+                table['main_id'],object_id_of_main_id)
+    if table_name=='ident':
+        table=best_para('id',table)
+    if table_name=='h_link':
+        #expanding from child_main_id to object_idref
+        #first remove the child_object_idref we got from empty
+        # initialization, the looked up one is appended at the end
+        table.remove_column('child_object_idref')
+        table['child_object_idref']=object_idrefs(
+                table['main_id'],object_id_of_main_id)
+        table.rename_column('main_id','child_main_id')
         
-        cat[table_name]=vstack([cat[table_name],empty[table_name]])
-        #filling so when I run unique it doesn't neglect previously masked columns
-        cat[table_name]=cat[table_name].filled() 
-
-        if 'object_idref' in cat[table_name].colnames and len(cat[table_name])>0: 
-            # add object_idref
-            # first remove the object_idref we got from empty 
-            # initialization though I would prefer a more elegant way 
-            # to do this. Is needed as empty columns don't work for join
-            cat[table_name].remove_column('object_idref') 
-            cat[table_name]=join(cat[table_name],cat['objects']['object_id','main_id'],
-                                 join_type='left')
-            cat[table_name].rename_column('object_id','object_idref')
-        if table_name=='ident':
-            cat[table_name]=best_para('id',cat[table_name])
-        if table_name=='h_link':
-            #expanding from child_main_id to object_idref
-            #first remove the child_object_idref we got from empty
-            # initialization. Would prefer a more elegant way to do this
-            cat[table_name].remove_column('child_object_idref')
-            cat[table_name]=join(cat[table_name],cat['objects']['object_id','main_id'],
-                                 keys='main_id',join_type='left')
-            cat[table_name].rename_columns(['object_id','main_id'],
-                                  ['child_object_idref','child_main_id'])
-            
-            #expanding from parent_main_id to parent_object_idref
-            cat[table_name].remove_column('parent_object_idref')
-            #kick out any h_link rows where parent_main_id not in
-            # objects (e.g. clusters)
-            cat[table_name]=join(cat[table_name],cat['objects']['object_id','main_id'],
-                   keys_left='parent_main_id',keys_right='main_id')
-            #removing because same as parent_main_id
-            cat[table_name].remove_column('main_id')
-            cat[table_name].rename_column('object_id','parent_object_idref')
-            cat['best_h_link']=best_para('membership',cat['h_link'])
-        if table_name=='star_basic':
-            #choosing all objects with type star or system. this I use 
-            # to join the object_id parameter from objects table to 
-            # star_basic. what about gaia stuff where I don't know 
-            # this? there I also don't have star_basic info.
-            # Note: main_id was only added because I have not found out 
-            # how to do join with just one column of a table
-            stars=cat['objects']['object_id','main_id'][np.where(
-                            cat['objects']['type']=='st')]
-            systems=cat['objects']['object_id','main_id'][np.where(
-                            cat['objects']['type']=='sy')]
-            temp=vstack([stars,systems])
-            temp.rename_column('object_id','object_idref')
-            
-            # cat[i] are all the star_cat tables from prov_tables_list where 
-            # those are given the new objects are needed to join the 
-            # best parameters from mes_ tables later on
-            cat[table_name]=join(cat[table_name],temp,join_type='outer',
-                                 keys=['object_idref','main_id'])
-        if table_name=='planet_basic':
-            planets=cat['objects']['object_id','main_id'][np.where(
-                            cat['objects']['type']=='pl')]
-            planets.rename_column('object_id','object_idref')
-            cat[table_name]=planets #can't use join below because cat[i] has no rows
-        if table_name=='mes_teff_st':
-            cat['star_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['star_basic'],
-                    'teff_st',['teff_st_value','teff_st_err',
-                               'teff_st_qual','teff_st_source_idref',
-                               'teff_st_ref'])
-        if table_name=='mes_radius_st':
-            cat['star_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['star_basic'],
-                    'radius_st',['radius_st_value','radius_st_err',
-                                 'radius_st_qual','radius_st_source_idref',
-                                 'radius_st_ref'])
-        if table_name=='mes_mass_st':
-            cat['star_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['star_basic'],
-                    'mass_st',['mass_st_value','mass_st_err',
-                               'mass_st_qual','mass_st_source_idref',
-                               'mass_st_ref'])
-        if table_name=='mes_mass_pl':
-            cat['planet_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['planet_basic'],
-                    'mass_pl')
-        if table_name=='mes_binary':
-            cat['star_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['star_basic'],
-                    'binary',['binary_flag',
-                              'binary_qual','binary_source_idref',
-                               'binary_ref'])
-        if table_name=='mes_sep_ang':
-            cat['star_basic']=best_parameters_ingestion(
-                    cat[table_name], cat['star_basic'],
-                    'sep_ang',['sep_ang_value','sep_ang_err',
-                               'sep_ang_obs_date','sep_ang_qual',
-                               'sep_ang_source_idref','sep_ang_ref'])
-            
-        cat[table_name]=cat[table_name].filled()
+        #expanding from parent_main_id to parent_object_idref
+        table.remove_column('parent_object_idref')
+        parent_object_idrefs=object_idrefs(
+                table['parent_main_id'],object_id_of_main_id)
+        #kick out any h_link rows where parent_main_id not in
+        # objects (e.g. clusters)
+        in_objects=np.invert(np.ma.getmaskarray(parent_object_idrefs))
+        table=table[in_objects]
+        table['parent_object_idref']=Column(
+                parent_object_idrefs.data[in_objects])
+        tables['best_h_link']=best_para('membership',table)
+    if table_name=='star_basic':
+        #choosing all objects with type star or system. this I use 
+        # to join the object_id parameter from objects table to 
+        # star_basic. what about gaia stuff where I don't know 
+        # this? there I also don't have star_basic info.
+        # Note: main_id was only added because I have not found out 
+        # how to do join with just one column of a table
+        temp=object_idref_ids[np.isin(
+                        np.asarray(cat['objects']['type']),['st','sy'])]
         
-        if len(cat[table_name])==0:
-            print('warning: empty table',table_name)
-        else:
-            #only keeping unique entries
-            cat[table_name]=unique(cat[table_name],silent=True)
+        # cat[i] are all the star_cat tables from prov_tables_list where 
+        # those are given the new objects are needed to join the 
+        # best parameters from mes_ tables later on. Same rows as an outer
+        # join on object_idref and main_id, as object_idref was looked up 
+        # from main_id
+        known=np.invert(np.ma.getmaskarray(table['object_idref']))
+        missing=np.invert(np.isin(np.asarray(temp['main_id']).astype(str),
+                np.asarray(table['main_id'][known]).astype(str)))
+        table=vstack([table,temp[missing]])
+    if table_name=='planet_basic':
+        planets=object_idref_ids[cat['objects']['type']=='pl']
+        table=planets #can't use join below because table has no rows
+    #best parameters are selected from the table before removing 
+    #duplicates, which reorders the rows. fill_masked_columns replaces 
+    #columns of the table it gets, so it gets a shallow copy to keep 
+    #mes_table unchanged
+    mes_table=table
+    table=fill_masked_columns(table.copy(copy_data=False))
+    
+    if len(table)==0:
+        print('warning: empty table',table_name)
+    else:
+        #only keeping unique entries
+        table=unique_rows(table)
+    tables[table_name]=table
+    return tables,mes_table
+
+#basic table, parameter and replaced basic table columns of each 
+#measurement table
+mes_tables = {
+    'mes_teff_st': ('star_basic','teff_st',
+                    ['teff_st_value','teff_st_err','teff_st_qual',
+                     'teff_st_source_idref','teff_st_ref']),
+    'mes_radius_st': ('star_basic','radius_st',
+                      ['radius_st_value','radius_st_err','radius_st_qual',
+                       'radius_st_source_idref','radius_st_ref']),
+    'mes_mass_st': ('star_basic','mass_st',
+                    ['mass_st_value','mass_st_err','mass_st_qual',
+                     'mass_st_source_idref','mass_st_ref']),
+    'mes_mass_pl': ('planet_basic','mass_pl',[]),
+    'mes_binary': ('star_basic','binary',
+                   ['binary_flag','binary_qual','binary_source_idref',
+                    'binary_ref']),
+    'mes_sep_ang': ('star_basic','sep_ang',
+                    ['sep_ang_value','sep_ang_err','sep_ang_obs_date',
+                     'sep_ang_qual','sep_ang_source_idref','sep_ang_ref'])
+}
+
+def build_rest_of_tables(cat,prov_tables_dict,empty):
+    #objects do not change anymore, so the main_id to object_id mapping 
+    #is built once for all tables
+    object_id_of_main_id=dict(zip(
+            np.asarray(cat['objects']['main_id']).astype(str),
+            np.asarray(cat['objects']['object_id'])))
+    #projection with the column names of the referencing tables, renamed
+    #once instead of in every branch
+    object_idref_ids=cat['objects']['object_id','main_id']
+    object_idref_ids.rename_column('object_id','object_idref')
+    ingestions=[]
+    provider_names=get_provider_names(prov_tables_dict)
+    #best parameters of the measurement tables are selected in the 
+    #background while the remaining tables are built, leaving the block 
+    #waits for the workers also if a build fails
+    with ThreadPoolExecutor() as executor:
+        for table_name in list(islice(cat,3,None)):
+        # for the tables star_basic,...,mes_mass_st
+            tables,mes_table=build_table(cat,table_name,prov_tables_dict,
+                                         empty,object_id_of_main_id,
+                                         object_idref_ids,provider_names)
+            cat.update(tables)
+            if table_name in mes_tables:
+                basic_table_name,para,columns=mes_tables[table_name]
+                ingestions.append((basic_table_name,executor.submit(
+                        best_para,para,mes_table),columns))
+        #the basic tables are final by now, joining the best parameters in 
+        #the original order once their selection is done
+        for basic_table_name,best_para_table,columns in ingestions:
+            cat[basic_table_name]=best_parameters_ingestion(
+                    best_para_table.result(),cat[basic_table_name],columns)
     return cat
 
 def build_tables(prov_tables_dict):
@@ -515,7 +676,7 @@ def building(prov_tables_dict):
     cat=build_tables(prov_tables_dict)
             
     #next line is needed as multimeasurement adaptions lead to potentially masked entries
-    cat['star_basic']=cat['star_basic'].filled()
+    cat['star_basic']=fill_masked_columns(cat['star_basic'])
     
     cat=unify_null_values(cat)
             
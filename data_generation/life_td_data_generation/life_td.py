@@ -5,6 +5,7 @@ Generates the data for the LIFE Target Database.
 
 from astropy.table import Table
 from astropy import io
+from concurrent.futures import ThreadPoolExecutor
 
 #self created modules
 from sdata import empty_cat, empty_provider_tables_dict
@@ -55,6 +56,27 @@ def load_cat(provider_name):
         cat[table] = prov[i] 
     return cat
 
+def _run_provider(function,arguments):
+    """
+    Calls a provider function with its arguments.
+    
+    :param function: Provider function, e.g. provider_simbad.
+    :type function: function
+    :param arguments: Single argument or tuple of arguments, empty tuple
+        if the function takes none.
+    :type arguments: tuple or object
+    :return: Provider tables.
+    :rtype: dict(str,astropy.table.table.Table)
+    """
+    if arguments!=():
+        try:
+            cat=function(arguments)
+        except:
+            cat=function(*arguments)
+    else:
+        cat=function()
+    return cat
+
 def partial_create(distance_cut_in_pc,create=[]):
     """
     Partially generates, partially loads life_td data.
@@ -77,23 +99,30 @@ def partial_create(distance_cut_in_pc,create=[]):
     provider_tables_dict=empty_provider_tables_dict.copy()
     data=io.votable.parse_single_table(
         Path().additional_data+"sdb_30pc_09_02_2024.xml").to_table()
-    functions = [provider_simbad,provider_sdb,provider_wds,provider_exo,provider_life,provider_gaia]
-    arguments = [(distance_cut_in_pc),(distance_cut_in_pc,data),(False),(),(),(distance_cut_in_pc)]
+    functions = {'sim':provider_simbad,'sdb':provider_sdb,'wds':provider_wds,
+                 'exo':provider_exo,'life':provider_life,'gaia':provider_gaia}
+    arguments = {'sim':(distance_cut_in_pc),'sdb':(distance_cut_in_pc,data),
+                 'wds':(False),'exo':(),'life':(),'gaia':(distance_cut_in_pc)}
     
-    for i,prov in enumerate(list(provider_tables_dict.keys())):
-        #provider_tables_dict[prov]=string_to_object_whole_dict(provider_tables_dict[prov])
-        if prov in create:
-            if arguments[i]!=():
-                try:
-                    cat=functions[i](arguments[i])
-                except:
-                    cat=functions[i](*arguments[i])
+    #the other providers load the saved simbad tables, so simbad goes first
+    if 'sim' in create:
+        provider_tables_dict['sim']=string_to_object_whole_dict(
+                _run_provider(functions['sim'],arguments['sim']))
+    #the remaining queries go to independent services and can run in parallel
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures={}
+        for prov in provider_tables_dict.keys():
+            if prov in create and prov!='sim':
+                futures[prov]=executor.submit(_run_provider,functions[prov],
+                                              arguments[prov])
+        for prov in provider_tables_dict.keys():
+            if prov in futures:
+                cat=futures[prov].result()
+            elif prov not in create:
+                cat = load_cat(prov)
             else:
-                cat=functions[i]()
-        else:
-            cat = load_cat(prov)
-        provider_tables_dict[prov]=string_to_object_whole_dict(cat)
-    
+                continue
+            provider_tables_dict[prov]=string_to_object_whole_dict(cat)
             
     #------------------------combine data from external sources---------
     database_tables=building(provider_tables_dict)
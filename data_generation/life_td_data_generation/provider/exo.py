@@ -4,7 +4,7 @@ Generates the data for the database for the provider Exo-Mercat.
 
 import numpy as np #arrays
 from astropy import io
-from astropy.table import Table, Column, MaskedColumn, join, setdiff
+from astropy.table import Table
 from datetime import datetime
 
 #self created modules
@@ -47,25 +47,18 @@ def create_exo_helpertable(exo):
         
     #----------------putting object main identifiers together-----------
     
-    # initializing column
-    exo_helptab['planet_main_id']=Column(dtype=object,
-                                                length=len(exo_helptab))
-    exo_helptab['host_main_id']=exo_helptab['main_id']
-
-    for i in range(len(exo_helptab)):
-        # if there is a main id use that
-        if type(exo_helptab['main_id'][i])!=np.ma.core.MaskedConstant:
-            hostname=exo_helptab['main_id'][i]
-        # else use host column entry
-        else:
-            hostname=exo_helptab['host'][i]
-        # if there is a binary entry
-        if type(exo_helptab['binary'][i])!=np.ma.core.MaskedConstant:
-            exo_helptab['host_main_id'][i]=hostname+' '+exo_helptab['binary'][i]
-        else:
-            exo_helptab['host_main_id'][i]=hostname
-        exo_helptab['planet_main_id'][i]=exo_helptab[
-                        'host_main_id'][i]+' '+exo_helptab['letter'][i]
+    # if there is a main id use that, else use host column entry
+    hostname=np.where(np.ma.getmaskarray(exo_helptab['main_id']),
+                      np.ma.filled(exo_helptab['host'],'').astype(str),
+                      np.ma.filled(exo_helptab['main_id'],'').astype(str))
+    # if there is a binary entry append it
+    host_main_id=np.where(np.ma.getmaskarray(exo_helptab['binary']),hostname,
+                    np.char.add(np.char.add(hostname,' '),
+                        np.ma.filled(exo_helptab['binary'],'').astype(str)))
+    exo_helptab['host_main_id']=host_main_id.astype(object)
+    exo_helptab['planet_main_id']=np.char.add(np.char.add(host_main_id,' '),
+                    np.ma.filled(exo_helptab['letter'],'').astype(str)
+                    ).astype(object)
     #join exo_helptab on host_main_id and sim_objects main_id
     # Unfortunately exomercat does not provide distance measurements so we
     # relie on matching it to simbad for enforcing the database cutoff of 20 pc.
@@ -79,10 +72,9 @@ def create_exo_helpertable(exo):
 
     # removing whitespace in front of main_id and name.
     # done after distance_cut function to prevent missing values error
-    for i in range(len(exo_helptab)):
-        exo_helptab['planet_main_id'][i]=exo_helptab['planet_main_id'][i].strip()
-        exo_helptab['main_id'][i]=exo_helptab['main_id'][i].strip()
-        exo_helptab['name'][i]=exo_helptab['name'][i].strip()
+    for colname in ['planet_main_id','main_id','name']:
+        exo_helptab[colname][:]=np.char.strip(
+                np.asarray(exo_helptab[colname]).astype(str))
         
     #fetching simbad main_id for planet since sometimes exomercat planet main id is not the same
     exo_helptab2=fetch_main_id(exo_helptab['planet_main_id','host_main_id'],
@@ -93,14 +85,17 @@ def create_exo_helpertable(exo):
     notinsimbad=exo_helptab['planet_main_id'][np.where(np.in1d(
             exo_helptab['planet_main_id'],exo_helptab2['planet_main_id'],
             invert=True))]
-    #I use a left join as otherwise I would loose some objects that are not in simbad
-    exo_helptab=join(exo_helptab,
-                            exo_helptab2['sim_planet_main_id','planet_main_id'],
-                            keys='planet_main_id',join_type='left')
+    #I use a left join like lookup as otherwise I would loose some objects
+    #that are not in simbad, those get an empty sim_planet_main_id
+    sim_planet_main_ids=dict(zip(exo_helptab2['planet_main_id'],
+                                 exo_helptab2['sim_planet_main_id']))
+    exo_helptab['sim_planet_main_id']=np.array(
+            [sim_planet_main_ids.get(planet_main_id,'')
+             for planet_main_id in exo_helptab['planet_main_id']],dtype=object)
 
     #show which elements from exo_helptab were not found in sim_objects
-    exo_helptab_before_distance_cut['name']=exo_helptab_before_distance_cut['name'].astype(object)
-    removed_objects=setdiff(exo_helptab_before_distance_cut,exo_helptab,keys=['name'])
+    removed_objects=exo_helptab_before_distance_cut[np.invert(np.isin(
+            exo_helptab_before_distance_cut['name'],exo_helptab['name']))]
     save([removed_objects],['exomercat_removed_objects'])
     return exo_helptab,exo
 
@@ -115,29 +110,24 @@ def create_ident_table(exo_helptab,exo):
     :returns: Identifier table.
     :rtype: astropy.table.table.Table
     """
-    exo_ident=Table(names=['main_id','id'],dtype=[object,object])
     exo_helptab['old_planet_main_id']=exo_helptab['planet_main_id']
+    planet_main_id=np.asarray(exo_helptab['planet_main_id'],dtype=object)
+    name=np.asarray(exo_helptab['name'],dtype=object)
     #why not found??
-    for i in range(len(exo_helptab)):
-        if exo_helptab['sim_planet_main_id'][i]!='':
-            #not included as already in simbad provider
-            #exo_ident.add_row([exo_helptab['sim_planet_main_id'][i],
-                               #exo_helptab['sim_planet_main_id'][i]]) 
-            if exo_helptab['planet_main_id'][i]!=exo_helptab['sim_planet_main_id'][i]:
-                exo_ident.add_row([exo_helptab['sim_planet_main_id'][i],
-                               exo_helptab['planet_main_id'][i]])
-            if exo_helptab['planet_main_id'][i]!=exo_helptab['name'][i] and \
-                    exo_helptab['sim_planet_main_id'][i]!=exo_helptab['name'][i]:
-                exo_ident.add_row([exo_helptab['sim_planet_main_id'][i],
-                               exo_helptab['name'][i]])
-            exo_helptab['planet_main_id'][i]=exo_helptab['sim_planet_main_id'][i]
-        else:
-            exo_ident.add_row([exo_helptab['planet_main_id'][i],
-                               exo_helptab['planet_main_id'][i]])
-            if exo_helptab['planet_main_id'][i]!=exo_helptab['name'][i]:
-                exo_ident.add_row([exo_helptab['planet_main_id'][i],
-                               exo_helptab['name'][i]])
-    exo_ident['id_ref']=[exo['provider']['provider_bibcode'][0] for j in range(len(exo_ident))]
+    sim_planet_main_id=np.asarray(np.ma.filled(
+            exo_helptab['sim_planet_main_id'],''),dtype=object)
+    in_sim=sim_planet_main_id!=''
+    main_id=np.where(in_sim,sim_planet_main_id,planet_main_id)
+    #the simbad main_id itself is not included as already in simbad provider
+    keep_planet_main_id=np.invert(in_sim) | (planet_main_id!=main_id)
+    keep_name=(name!=planet_main_id) & (name!=main_id)
+    #row wise flattening keeps the identifiers of one object together
+    keep=np.stack([keep_planet_main_id,keep_name],axis=1)
+    exo_ident=Table([np.stack([main_id,main_id],axis=1)[keep],
+                     np.stack([planet_main_id,name],axis=1)[keep]],
+                    names=['main_id','id'],dtype=[object,object])
+    exo_helptab['planet_main_id'][:]=main_id
+    exo_ident['id_ref']=np.full(len(exo_ident),exo['provider']['provider_bibcode'][0])
 
     # TBD: I had a wrong double object though currently not any longer
     #print("""TBD: I have a wrong double object because of different amount of white
@@ -157,16 +147,7 @@ def create_objects_table(exo):
     # tbd at one point: I think I want to add hosts to object
     exo_objects=Table(names=['main_id','ids'],dtype=[object,object])
     exo_objects=ids_from_ident(exo['ident']['main_id','id'],exo_objects)
-    #grouped_exo_ident=exo_ident.group_by('main_id')
-    #ind=grouped_exo_ident.groups.indices
-    #for i in range(len(ind)-1):
-    # -1 is needed because else ind[i+1] is out of bonds
-     #   ids=[]
-      #  for j in range(ind[i],ind[i+1]):
-       #     ids.append(grouped_exo_ident['id'][j])
-        #ids="|".join(ids)
-        #exo_objects.add_row([grouped_exo_ident['main_id'][ind[i]],ids])
-    exo_objects['type']=['pl' for j in range(len(exo_objects))]
+    exo_objects['type']=np.full(len(exo_objects),'pl')
     return exo_objects
 
 def create_mes_mass_pl_table(exo_helptab,exo):
@@ -180,45 +161,27 @@ def create_mes_mass_pl_table(exo_helptab,exo):
     :returns: Planetary mass measurement table.
     :rtype: astropy.table.table.Table
     """
-    #initialize columns exo_helptab['mass_pl_rel'] and exo_helptab['mass_pl_err']
-    exo_helptab['mass_pl_err']=Column(dtype=float,length=len(exo_helptab))
-    exo_helptab['mass_pl_rel']=Column(dtype=object,length=len(exo_helptab))
-    exo_helptab['mass_pl_qual']=MaskedColumn(dtype=object,length=len(exo_helptab))
-    exo_helptab['mass_pl_qual']=['?' for j in range(len(exo_helptab))]
     #transforming mass errors from upper (mass_max) and lower (mass_min) error
     # into instead error (mass_error) as well as relation (mass_pl_rel)
-    for i in range(len(exo_helptab)):
-        if type(exo_helptab['mass_max'][i])==np.ma.core.MaskedConstant or \
-                  exo_helptab['mass_max'][i]==np.inf:
-            if type(exo_helptab['mass_min'][i])==np.ma.core.MaskedConstant or \
-                  exo_helptab['mass_min'][i]==np.inf:
-                exo_helptab['mass_pl_rel'][i]=None
-                exo_helptab['mass_pl_err'][i]=1e+20
-            else:
-                exo_helptab['mass_pl_rel'][i]='<'
-                exo_helptab['mass_pl_err'][i]=exo_helptab['mass_min'][i]
-                exo_helptab['mass_pl_qual'][i]='C'
-                # tbd: check if relation is correct in case of maximum error 
-                # on a lower limit value')
-        else:
-            if type(exo_helptab['mass_min'][i])==np.ma.core.MaskedConstant or \
-                  exo_helptab['mass_min'][i]==np.inf:
-                exo_helptab['mass_pl_rel'][i]='>'
-                exo_helptab['mass_pl_err'][i]=exo_helptab['mass_max'][i]
-                exo_helptab['mass_pl_qual'][i]='C'
-            else:
-                exo_helptab['mass_pl_rel'][i]='='
-                exo_helptab['mass_pl_err'][i]=max(exo_helptab['mass_max'][i],
-                                        exo_helptab['mass_min'][i])
-                exo_helptab['mass_pl_qual'][i]='B'
+    mass_max=np.ma.filled(exo_helptab['mass_max'],np.inf)
+    mass_min=np.ma.filled(exo_helptab['mass_min'],np.inf)
+    no_max=np.ma.getmaskarray(exo_helptab['mass_max']) | (mass_max==np.inf)
+    no_min=np.ma.getmaskarray(exo_helptab['mass_min']) | (mass_min==np.inf)
+    # tbd: check if relation is correct in case of maximum error 
+    # on a lower limit value')
+    cases=[no_max & no_min, no_max & ~no_min, ~no_max & no_min]
+    exo_helptab['mass_pl_rel']=np.select(cases,[None,'<','>'],default='=')
+    exo_helptab['mass_pl_err']=np.select(cases,[1e+20,mass_min,mass_max],
+                                default=np.maximum(mass_max,mass_min))
+    exo_helptab['mass_pl_qual']=np.select(cases,['?','C','C'],default='B')
     exo_mes_mass_pl=exo_helptab['planet_main_id','mass','mass_pl_err','mass_url',
                             'mass_pl_rel','mass_pl_qual']
     exo_mes_mass_pl.rename_columns(['planet_main_id','mass','mass_url'],
                                     ['main_id','mass_pl_value','mass_pl_ref'])
-    #remove masked rows
-    exo_mes_mass_pl.remove_rows(exo_mes_mass_pl['mass_pl_value'].mask.nonzero()[0])
-    #remove null values
-    exo_mes_mass_pl=exo_mes_mass_pl[np.where(exo_mes_mass_pl['mass_pl_value']!=1e+20)]
+    #remove masked rows and null values
+    mass_pl_value=exo_mes_mass_pl['mass_pl_value']
+    exo_mes_mass_pl=exo_mes_mass_pl[np.invert(np.ma.getmaskarray(mass_pl_value))
+                                    & (np.asarray(mass_pl_value)!=1e+20)]
     #tbd: include masssini measurements from exomercat
     return exo_mes_mass_pl
 
@@ -236,7 +199,7 @@ def create_h_link_table(exo_helptab,exo):
     exo_h_link=exo_helptab['planet_main_id', 'host_main_id']
     exo_h_link.rename_columns(['planet_main_id','host_main_id'],
                               ['main_id','parent_main_id'])
-    exo_h_link['h_link_ref']=[exo['provider']['provider_bibcode'][0] for j in range(len(exo_h_link))]
+    exo_h_link['h_link_ref']=np.full(len(exo_h_link),exo['provider']['provider_bibcode'][0])
     return exo_h_link
 
 def create_exo_sources_table(exo):
@@ -4,15 +4,15 @@ Generates the data for the database for the provider gaia.
 
 import numpy as np #arrays
 from pyvo.dal import TAPService
-from astropy.table import Table, vstack, setdiff, join
+from astropy.table import Table, Column, vstack, setdiff, join
 from datetime import datetime
 
 #self created modules
 from utils.io import save
-from provider.utils import fetch_main_id, IdentifierCreator, fill_sources_table, create_sources_table, ids_from_ident, replace_value, create_provider_table
+from provider.utils import query, save_query_cache, fetch_main_id, IdentifierCreator, fill_sources_table, create_sources_table, ids_from_ident, replace_value, create_provider_table
 from sdata import empty_cat
 
-def create_gaia_helpertable(distance_cut_in_pc,gaia):
+def create_gaia_helpertable(distance_cut_in_pc,gaia,cache=False):
     """
     Creates helper table.
     
@@ -22,6 +22,9 @@ def create_gaia_helpertable(distance_cut_in_pc,gaia):
     :param float distance_cut_in_pc: Distance up to which stars are included.
     :param gaia: Dictionary of database table names and tables.
     :type gaia: dict(str,astropy.table.table.Table)
+    :param cache: If True the query result is cached on disk and reused,
+        defaults to False.
+    :type cache: bool, optional
     :returns: Helper table.
     :rtype: astropy.table.table.Table
     """
@@ -39,19 +42,23 @@ def create_gaia_helpertable(distance_cut_in_pc,gaia):
     WHERE s.parallax >="""+str(plx_in_mas_cut)
     
     try: 
-        gaia_helptab=query(gaia['provider']['provider_url'][0],adql_query) 
+        gaia_helptab=query(gaia['provider']['provider_url'][0],adql_query,
+                           cache=cache)
 
     except:
         #because of bug in gaia server where async not working currently
         service = TAPService(gaia['provider']['provider_url'][0])
         result=service.run_sync(adql_query.format(**locals()), maxrec=160000)
         gaia_helptab=result.to_table()
+        if cache:
+            save_query_cache(gaia_helptab,gaia['provider']['provider_url'][0],
+                             adql_query)
         
     gaia_helptab.rename_columns(['mass_flame','radius_flame'],
                         ['mass_st_value','radius_st_value'])
-    gaia_helptab['gaia_id']=['Gaia DR3 '+
-            str(gaia_helptab['source_id'][j]) for j in range(len(gaia_helptab))]
-    gaia_helptab['ref']=['2022arXiv220800211G' for j in range(len(gaia_helptab))]
+    gaia_helptab['gaia_id']=np.char.add('Gaia DR3 ',
+            np.asarray(gaia_helptab['source_id']).astype(str))
+    gaia_helptab['ref']=np.full(len(gaia_helptab),'2022arXiv220800211G')
     return gaia_helptab
 
 def create_ident_table(gaia_helptab,gaia):  
@@ -68,31 +75,37 @@ def create_ident_table(gaia_helptab,gaia):
     #---------------gaia_ident-----------------------
     gaia_sim_idmatch=fetch_main_id(gaia_helptab['gaia_id','ref'],
                            IdentifierCreator(name='main_id',colname='gaia_id')) 
+    #normalizing to str once here keeps setdiff and vstack below free of
+    #further conversions
+    for col in gaia_sim_idmatch.colnames:
+        gaia_sim_idmatch[col]=gaia_sim_idmatch[col].astype(str)
     #should be gaia_id, main_id, ref minus 40 objects that have only gaia_id
     gaia_ident=gaia_sim_idmatch.copy()
     gaia_ident.rename_columns(['gaia_id','ref'],['id','id_ref'])
-    gaia_ident['id_ref']=gaia_ident['id_ref'].astype(str)
     #creating simbad main_id ident rows
     sim_main_id_ident=Table()
     sim_main_id_ident['main_id']=gaia_ident['main_id']
     sim_main_id_ident['id']=gaia_ident['main_id']
-    sim_main_id_ident['id_ref']=['2000A&AS..143....9W' for j in range(len(gaia_ident))]
-    gaia_ident=vstack([gaia_ident,sim_main_id_ident])
+    sim_main_id_ident['id_ref']=np.full(len(gaia_ident),'2000A&AS..143....9W')
     #now need to add the 40 objects that have only gaia_identifiers
-    #for setdiff need both columns to be same type
-    for col in gaia_sim_idmatch.colnames:
-        gaia_sim_idmatch[col]=gaia_sim_idmatch[col].astype(str)
     gaia_only_id=setdiff(gaia_helptab['gaia_id','ref'],gaia_sim_idmatch['gaia_id','ref'])
     gaia_only_id['main_id']=gaia_only_id['gaia_id']
     gaia_only_id.rename_columns(['gaia_id','ref'],['id','id_ref'])
-    #for vstack need both columns to be same type
-    for col in gaia_ident.colnames:
-        gaia_ident[col]=gaia_ident[col].astype(str)
-    gaia_ident=vstack([gaia_ident,gaia_only_id])
-    #add main_id to gaia table
-    gaia_helptab=join(gaia_ident['main_id','id'],gaia_helptab,
-                       keys_left='id', keys_right='gaia_id')
-    gaia_helptab.remove_column('id')
+    gaia_ident=vstack([gaia_ident,sim_main_id_ident,gaia_only_id])
+    #add main_id to gaia table, gaia_id is unique in the helper table so a
+    #sorted lookup replaces the general join
+    ids=np.asarray(gaia_ident['id'])
+    gaia_ids=np.asarray(gaia_helptab['gaia_id']).astype(str)
+    order=np.argsort(gaia_ids)
+    pos=np.minimum(np.searchsorted(gaia_ids,ids,sorter=order),
+                   max(len(gaia_ids)-1,0))
+    found=gaia_ids[order[pos]]==ids if len(gaia_ids)>0 else \
+            np.zeros(len(ids),dtype=bool)
+    #same row order as the join, sorted by gaia_id
+    rows=np.flatnonzero(found)[np.argsort(ids[found],kind='stable')]
+    matched=gaia_helptab[order[pos[rows]]]
+    matched.add_column(gaia_ident['main_id'][rows],name='main_id',index=0)
+    gaia_helptab=matched
     return gaia_ident,gaia_helptab
 
 def create_objects_table(gaia_helptab,gaia): 
@@ -109,12 +122,11 @@ def create_objects_table(gaia_helptab,gaia):
     #-----------------gaia_objects------------------
     gaia_objects=Table(names=['main_id','ids'],dtype=[object,object])
     gaia_objects=ids_from_ident(gaia['ident']['main_id','id'],gaia_objects)
-    gaia_objects['type']=['st' for j in range(len(gaia_objects))]
+    gaia_objects['type']=np.full(len(gaia_objects),'st')
     gaia_objects['main_id']=gaia_objects['main_id'].astype(str)
     gaia_objects=join(gaia_objects,gaia_helptab['main_id','nss_solution_type'],
                       join_type='left')
-    gaia_objects['type'][np.where(gaia_objects['nss_solution_type']!='')]=['sy' for j in range(len(
-            gaia_objects['type'][np.where(gaia_objects['nss_solution_type']!='')]))]
+    gaia_objects['type'][gaia_objects['nss_solution_type']!='']='sy'
     gaia_objects.remove_column('nss_solution_type')
     return gaia_objects
 
@@ -134,9 +146,9 @@ def create_mes_binary_table(gaia):
     gaia_mes_binary['binary_flag']=gaia_mes_binary['binary_flag'].astype(object)
     gaia_mes_binary=replace_value(gaia_mes_binary,'binary_flag','sy','True')
     gaia_mes_binary=replace_value(gaia_mes_binary,'binary_flag','st','False')
-    gaia_mes_binary['binary_ref']=['2016A&A...595A...1G' for j in range(len(gaia_mes_binary))]
-    gaia_mes_binary['binary_qual']=['B' if gaia_mes_binary['binary_flag'][j]=='True' \
-                                    else 'E' for j in range(len(gaia_mes_binary))]
+    gaia_mes_binary['binary_ref']=np.full(len(gaia_mes_binary),'2016A&A...595A...1G')
+    gaia_mes_binary['binary_qual']=np.where(
+            gaia_mes_binary['binary_flag']=='True','B','E')
     #if necessary lower binary_qual for binary_flag = False to level of simbad.
     return gaia_mes_binary
 
@@ -151,24 +163,21 @@ def create_mes_teff_st_table(gaia_helptab,gaia):
     :returns: Stellar effective temperature table.
     :rtype: astropy.table.table.Table
     """
-    gaia_mes_teff_st=gaia_helptab['main_id','teff_gspphot']
-    gaia_mes_teff_st['ref']=[gaia_helptab['ref'][j]+ ' GSP-Phot'
-                         for j in range(len(gaia_helptab))]
-    
-    #remove masked rows
-    gaia_mes_teff_st.remove_rows(gaia_mes_teff_st['teff_gspphot'].mask.nonzero()[0])
-    gaia_mes_teff_st.rename_columns(['teff_gspphot','ref'],['teff_st_value','teff_st_ref'])
-    
-    temp=gaia_helptab['main_id','teff_gspspec']
-    temp['ref']=[gaia_helptab['ref'][j]+ ' GSP-Spec'
-                for j in range(len(gaia_helptab))]
-    temp.remove_rows(temp['teff_gspspec'].mask.nonzero()[0])
-    temp.rename_columns(['teff_gspspec','ref'],['teff_st_value','teff_st_ref'])
-    
-    gaia_mes_teff_st=vstack([gaia_mes_teff_st,temp])
-    gaia_mes_teff_st['teff_st_qual']=['B' for j in range(len(gaia_mes_teff_st))]
-    gaia_mes_teff_st=gaia_mes_teff_st['main_id','teff_st_value',
-                                      'teff_st_qual','teff_st_ref']
+    #concatenating the unmasked photometric and spectroscopic values
+    #builds the table in one go instead of two copies and a vstack
+    phot=np.invert(np.ma.getmaskarray(gaia_helptab['teff_gspphot']))
+    spec=np.invert(np.ma.getmaskarray(gaia_helptab['teff_gspspec']))
+    main_id=np.asarray(gaia_helptab['main_id'])
+    ref=np.asarray(gaia_helptab['ref'],dtype=str)
+    teff=np.concatenate([np.asarray(gaia_helptab['teff_gspphot'])[phot],
+                         np.asarray(gaia_helptab['teff_gspspec'])[spec]])
+    gaia_mes_teff_st=Table()
+    gaia_mes_teff_st['main_id']=np.concatenate([main_id[phot],main_id[spec]])
+    gaia_mes_teff_st['teff_st_value']=Column(teff,
+            unit=gaia_helptab['teff_gspphot'].unit)
+    gaia_mes_teff_st['teff_st_qual']=np.full(len(teff),'B')
+    gaia_mes_teff_st['teff_st_ref']=np.concatenate([
+            np.char.add(ref[phot],' GSP-Phot'),np.char.add(ref[spec],' GSP-Spec')])
     return gaia_mes_teff_st
 
 def create_mes_radius_st_table(gaia_helptab,gaia):  
@@ -183,10 +192,11 @@ def create_mes_radius_st_table(gaia_helptab,gaia):
     :rtype: astropy.table.table.Table
     """
     gaia_mes_radius_st=gaia_helptab['main_id','radius_st_value','ref']
-    gaia_mes_radius_st.remove_rows(gaia_mes_radius_st['radius_st_value'].mask.nonzero()[0])
-    gaia_mes_radius_st['radius_st_qual']=['B' for j in range(len(gaia_mes_radius_st))]
-    gaia_mes_radius_st['radius_st_ref']=[gaia_mes_radius_st['ref'][j] + ' FLAME'
-                                   for j in range(len(gaia_mes_radius_st))]
+    gaia_mes_radius_st=gaia_mes_radius_st[np.invert(
+            gaia_mes_radius_st['radius_st_value'].mask)]
+    gaia_mes_radius_st['radius_st_qual']=np.full(len(gaia_mes_radius_st),'B')
+    gaia_mes_radius_st['radius_st_ref']=np.char.add(
+            np.asarray(gaia_mes_radius_st['ref'],dtype=str),' FLAME')
     gaia_mes_radius_st.remove_column('ref')
     return gaia_mes_radius_st
 
@@ -202,10 +212,11 @@ def create_mes_mass_st_table(gaia_helptab,gaia):
     :rtype: astropy.table.table.Table
     """
     gaia_mes_mass_st=gaia_helptab['main_id','mass_st_value','ref']
-    gaia_mes_mass_st.remove_rows(gaia_mes_mass_st['mass_st_value'].mask.nonzero()[0])
-    gaia_mes_mass_st['mass_st_qual']=['B' for j in range(len(gaia_mes_mass_st))]
-    gaia_mes_mass_st['mass_st_ref']=[gaia_mes_mass_st['ref'][j] + ' FLAME'
-                                   for j in range(len(gaia_mes_mass_st))]
+    gaia_mes_mass_st=gaia_mes_mass_st[np.invert(
+            gaia_mes_mass_st['mass_st_value'].mask)]
+    gaia_mes_mass_st['mass_st_qual']=np.full(len(gaia_mes_mass_st),'B')
+    gaia_mes_mass_st['mass_st_ref']=np.char.add(
+            np.asarray(gaia_mes_mass_st['ref'],dtype=str),' FLAME')
     gaia_mes_mass_st.remove_column('ref')
     return gaia_mes_mass_st
 
@@ -227,11 +238,14 @@ def create_gaia_sources_table(gaia):
                                       gaia['provider']['provider_name'][0])
     return gaia_sources     
 
-def provider_gaia(distance_cut_in_pc):
+def provider_gaia(distance_cut_in_pc,cache=False):
     """
     Obtains and arranges gaia data.
     
     :param float distance_cut_in_pc: Distance up to which stars are included.
+    :param cache: If True the query result is cached on disk and reused,
+        defaults to False.
+    :type cache: bool, optional
     :returns: Dictionary with names and astropy tables containing
         reference data, provider data, object data, identifier data,  
         stellar effective temperature, radius, mass and binarity data.
@@ -242,7 +256,7 @@ def provider_gaia(distance_cut_in_pc):
     gaia['provider'] = create_provider_table('Gaia',
                                   "https://gea.esac.esa.int/tap-server/tap",
                                   '2016A&A...595A...1G')
-    gaia_helptab=create_gaia_helpertable(distance_cut_in_pc,gaia)
+    gaia_helptab=create_gaia_helpertable(distance_cut_in_pc,gaia,cache)
     gaia['ident'],gaia_helptab=create_ident_table(gaia_helptab,gaia)  
     gaia['objects']=create_objects_table(gaia_helptab,gaia)    
     gaia['mes_binary']=create_mes_binary_table(gaia)
@@ -2,75 +2,23 @@
 Generates the data for the database for the provider LIFE. 
 """
 
+import re
+from functools import lru_cache
 import numpy as np #arrays
 from astropy import units, io, coordinates
-from astropy.table import Table, unique, join, MaskedColumn, Column
+from astropy.table import Table, join, MaskedColumn, Column
 from datetime import datetime
 
 #self created modules
 from utils.io import save, load, Path
-from provider.utils import fill_sources_table, create_sources_table, replace_value, create_provider_table
+from provider.utils import fill_sources_table, create_sources_table, replace_value, create_provider_table, unique_by_key
 from sdata import empty_cat
 
 
 
-def lum_class(nr,sptype):
-    """
-    Extracts luminocity class.
-    
-    :param int nr: index number
-    :param str sptype: spectral type
-    :returns: luminocity class
-    :rtype: str
-    """
-    
-    lum_class=sptype[nr]
-    if len(sptype)>nr+1 and sptype[nr+1] in ['I','V']:
-        lum_class=sptype[nr:nr+2]
-        if len(sptype)>nr+2 and sptype[nr+2] in ['I','V']:
-            lum_class=sptype[nr:nr+3]
-    return lum_class
-
-def assign_lum_class_V(table,index):
-    """
-    Assignes luminocity class 'V' to specified entry of table.
-    
-    :param table: Table containing column 'class_lum'.
-    :type table: astropy.table.table.Table
-    :param int index: Index of entry.
-    """
-    table['class_lum'][index]='V'
-    return
-
-def assign_null_values(table,index):
-    """
-    Sets table entry to '?' for given index in specific columns.
-    
-    :param table: Table containing columns class_temp, class_temp_nr, 
-        class_lum and class_ref.
-    :type table: astropy.table.table.Table
-    :param int index: Index of entry.
-    """
-    table['class_temp'][index]='?'
-    table['class_temp_nr'][index]='?'
-    table['class_lum'][index]='?'
-    table['class_ref'][index]='?'
-    return
-
-def deal_with_leading_d_sptype(table,index):
-    """
-    Deals with old annotation of leading d in spectraltype representing dwarf star.
-    
-    :param table: Table containing column 'sptype_string'.
-    :type table: astropy.table.table.Table
-    :param int index: Index of entry.  
-    :returns: Entry with leading d removed.
-    :rtype: str
-    """
-    if len(table['sptype_string'][index])>0:
-        if table['sptype_string'][index][0]=='d':
-            assign_lum_class_V(table,index)      
-    return table['sptype_string'][index].strip('d')
+#temperature class, temperature class number (e.g. 5 or 5.5) and up to three
+#luminocity class characters directly following the number
+sptype_pattern=re.compile(r'^([OBAFGKM])(?:(\d(?:\..?)?)([IV]{1,3})?)?')
 
 def sptype_string_to_class(temp,ref):
     """
@@ -91,41 +39,26 @@ def sptype_string_to_class(temp,ref):
         class_temp_nr, class_lum and class_ref.
     :rtype: astropy.table.table.Table
     """
-
-    temp['class_temp']=MaskedColumn(dtype=object,length=len(temp))
-    temp['class_temp_nr']=MaskedColumn(dtype=object,length=len(temp))
-    temp['class_lum']=MaskedColumn(dtype=object,length=len(temp))
-    temp['class_ref']=MaskedColumn(dtype=object,length=len(temp))
-
-    for i in range(len(temp)):
-        #sorting out objects like M5V+K7V
-        sptype=deal_with_leading_d_sptype(temp,i)
-        
-        if (len(sptype.split('+'))==1 and
-                #sorting out entries like ''
-                len(sptype)>0 and 
-                # sorting out brown dwarfs i.e. T1V
-                sptype[0] in ['O','B','A','F','G','K','M']):
-            #assigning temperature class and reference
-            temp['class_temp'][i]=sptype[0]
-            temp['class_ref'][i]=ref
-            if len(sptype)>1 and sptype[1] in ['0','1','2','3','4','5','6','7','8','9']:
-                temp['class_temp_nr'][i]=sptype[1]
-                #distinguishing between objects like K5V and K5.5V
-                if len(sptype)>2 and sptype[2]=='.':
-                    temp['class_temp_nr'][i]=sptype[1:4]
-                    if len(sptype)>4 and sptype[4] in ['I','V']:
-                        temp['class_lum'][i]=lum_class(4,sptype)
-                    else:
-                        assign_lum_class_V(temp,i) # assumption
-                elif len(sptype)>2 and sptype[2] in ['I','V']:
-                    temp['class_lum'][i]=lum_class(2,sptype)
-                else:
-                    assign_lum_class_V(temp,i) # assumption
-            else:
-                assign_lum_class_V(temp,i) # assumption
-        else:
-            assign_null_values(temp,i)
+    #old annotation of leading d representing dwarf star is removed
+    sptypes=np.char.strip(np.asarray(temp['sptype_string']).astype(str),'d')
+    matches=[sptype_pattern.match(sptype) for sptype in sptypes]
+    parts=np.array([match.groups('') if match else ('','','')
+                    for match in matches],dtype=object).reshape(-1,3)
+    #sorting out entries like '', brown dwarfs i.e. T1V and objects like
+    #M5V+K7V
+    valid=(parts[:,0]!='') & (np.char.find(sptypes,'+')<0)
+
+    temp['class_temp']=MaskedColumn(np.where(valid,parts[:,0],'?'),
+                                    dtype=object)
+    #no temperature class number given keeps the column default of 0
+    temp['class_temp_nr']=MaskedColumn(np.where(valid,
+                                    np.where(parts[:,1]=='',0,parts[:,1]),
+                                    '?'),dtype=object)
+    #no luminocity class given gets V assigned (assumption)
+    temp['class_lum']=MaskedColumn(np.where(valid,
+                                    np.where(parts[:,2]=='','V',parts[:,2]),
+                                    '?'),dtype=object)
+    temp['class_ref']=MaskedColumn(np.where(valid,ref,'?'),dtype=object)
     return temp
 
 def realspectype(cat):
@@ -149,27 +82,42 @@ def realspectype(cat):
     
     return ms
 
-def model_param():
+@lru_cache(maxsize=1)
+def _read_model_param():
+    """
+    Reads and cleans up model file once per session.
+
+    :returns: Table of the 4 parameters as columns
+    :rtype: astropy.table.table.Table
+    """
+    EEM_table=io.ascii.read(Path().additional_data+"Mamajek2022-04-16.csv")['SpT','Teff','R_Rsun','Msun']
+    EEM_table.rename_columns(['R_Rsun','Msun'],['Radius','Mass'])
+    #the csv reader strips the whitespace around the placeholders
+    EEM_table=replace_value(EEM_table,'Radius','...','nan')
+    EEM_table=replace_value(EEM_table,'Mass',['...','....'],'nan')
+    EEM_table['Teff'].unit=units.K
+    EEM_table['Radius'].unit=units.R_sun
+    EEM_table['Mass'].unit=units.M_sun
+    return EEM_table
+
+def model_param(write_xml=False):
     """
     Loads and cleans up model file.
 
     Loads the table of Eric E. Mamajek containing stellar parameters 
     modeled from spectral types. Cleans up the columns for spectral 
-    type, effective temperature radius and mass.
+    type, effective temperature radius and mass. The file is only read
+    once per session.
 
+    :param bool write_xml: If True the table is also saved as votable
+        model_param.xml. Defaults to False.
     :returns: Table of the 4 parameters as columns
     :rtype: astropy.table.table.Table
     """
 
-    EEM_table=io.ascii.read(Path().additional_data+"Mamajek2022-04-16.csv")['SpT','Teff','R_Rsun','Msun']
-    EEM_table.rename_columns(['R_Rsun','Msun'],['Radius','Mass'])
-    EEM_table=replace_value(EEM_table,'Radius',' ...','nan')
-    EEM_table=replace_value(EEM_table,'Mass',' ...','nan')
-    EEM_table=replace_value(EEM_table,'Mass',' ....','nan')
-    EEM_table['Teff'].unit=units.K
-    EEM_table['Radius'].unit=units.R_sun
-    EEM_table['Mass'].unit=units.M_sun       
-    io.votable.writeto(io.votable.from_table(EEM_table), \
+    EEM_table=_read_model_param().copy()
+    if write_xml:
+        io.votable.writeto(io.votable.from_table(EEM_table), \
                           f'{Path().additional_data}model_param.xml')#saving votable
     return EEM_table
 
@@ -195,37 +143,34 @@ def match_sptype(cat,model_param,sptypestring='sim_sptype',teffstring='mod_Teff'
     :rtype: astropy.table.table.Table
     """
 
+    #last matching model entry wins as in a sequential search
+    model_values=[(float(teff),float(radius),float(mass)) for teff,radius,mass
+                  in zip(model_param['Teff'],model_param['Radius'],
+                         model_param['Mass'])]
+    lookup2=dict(zip([sptype[:2] for sptype in model_param['SpT']],
+                     model_values))
+    lookup4=dict(zip([sptype[:4] for sptype in model_param['SpT']],
+                     model_values))
+    sptypes=np.ma.filled(cat[sptypestring],'').astype(str)
+    empty=sptypes==''
+    #remove first d coming from old notation for dwarf meaning main sequence star
+    sptypes=np.char.strip(sptypes,'d')
+    cat[sptypestring][np.invert(empty)]=sptypes[np.invert(empty)]
+    cat[sptypestring][empty]='None'
+    no_match=(np.nan,np.nan,np.nan)
+    #many stars share a spectral type, so only the distinct ones are looked up
+    distinct_sptypes,inverse=np.unique(sptypes,return_inverse=True)
+    #match first two letters, as the model does not cover all spectral 
+    #types on .5 accuracy, those are matched on the first four letters
+    #where possible
+    values=[lookup4[sptype[:4]] if sptype[2:4]=='.5' and sptype[:4] in lookup4
+            else lookup2.get(sptype[:2],no_match) for sptype in distinct_sptypes]
+    values=np.array(values,dtype=float).reshape(-1,3)[inverse]
     #initiating columns with right units
-    
-    arr=np.zeros(len(cat))
-    cat[teffstring]=arr*np.nan*units.K
-    cat[teffstring]=MaskedColumn(mask=np.full(len(cat),True), \
-                                         length=len(cat),unit=units.K)
-    cat[rstring]=arr*np.nan*units.R_sun
-    cat[mstring]=arr*np.nan*units.M_sun
-    #go through all spectral types in cat
-    for j in range(len(cat[sptypestring])): 
-        # for all the entries that are not empty
-        if cat[sptypestring][j]!='':
-            #remove first d coming from old notation for dwarf meaning main sequence star
-            cat[sptypestring][j]=cat[sptypestring][j].strip('d')
-            #go through the model spectral types of Mamajek 
-            for i in range(len(model_param['SpT'])): 
-                #match first two letters
-                if model_param['SpT'][i][:2]==cat[sptypestring][j][:2]: 
-                        cat[teffstring][j]=model_param['Teff'][i]
-                        cat[rstring][j]=model_param['Radius'][i]
-                        cat[mstring][j]=model_param['Mass'][i]
-            #as the model does not cover all spectral types on .5 accuracy, check those separately
-            if cat[sptypestring][j][2:4]=='.5':
-                for i in range(len(model_param['SpT'])):
-                    # match first four letters
-                    if model_param['SpT'][i][:4]==cat[sptypestring][j][:4]:
-                        cat[teffstring][j]=model_param['Teff'][i]
-                        cat[rstring][j]=model_param['Radius'][i]
-                        cat[mstring][j]=model_param['Mass'][i] 
-        else:
-            cat[sptypestring][j]='None' 
+    cat[teffstring]=MaskedColumn(values[:,0],mask=np.isnan(values[:,0]),
+                                 unit=units.K)
+    cat[rstring]=Column(values[:,1],unit=units.R_sun)
+    cat[mstring]=Column(values[:,2],unit=units.M_sun)
     return cat
 
 def spec(cat):
@@ -250,9 +195,11 @@ def spec(cat):
         #f"catalogs/model_param.xml").to_table()
     mp=model_param()#create model table as votable
     cat=match_sptype(cat,mp,sptypestring='sptype_string')
-    cat.remove_rows([np.where(cat['mod_Teff'].mask==True)])
-    cat.remove_rows([np.where(np.isnan(cat['mod_Teff']))])
-    cat=unique(cat, keys='main_id')
+    #keeping only rows with a model temperature in one selection
+    keep=np.invert(np.ma.getmaskarray(cat['mod_Teff'])) & \
+            np.invert(np.isnan(np.ma.filled(cat['mod_Teff'],np.nan)))
+    cat=cat[keep]
+    cat=unique_by_key(cat,'main_id')
     return cat
 
 def create_star_basic_table(life):  
@@ -264,46 +211,38 @@ def create_star_basic_table(life):
     :returns: Basic stellar data table.
     :rtype: astropy.table.table.Table
     """
+    life_name=life['provider']['provider_name'][0]
     #galactic coordinates:  transformed from simbad ircs coordinates using astropy
     [life_star_basic]=load(['sim_star_basic'])
     ircs_coord=coordinates.SkyCoord(\
             ra=life_star_basic['coo_ra'],dec=life_star_basic['coo_dec'],frame='icrs')
     gal_coord=ircs_coord.galactic
-    life_star_basic['coo_gal_l']=gal_coord.l.deg*units.degree
-    life_star_basic['coo_gal_b']=gal_coord.b.deg*units.degree
+    life_star_basic['coo_gal_l']=Column(gal_coord.l.degree,unit=units.degree)
+    life_star_basic['coo_gal_b']=Column(gal_coord.b.degree,unit=units.degree)
     life_star_basic['dist_st_value']=1000./life_star_basic['plx_value'] 
     life_star_basic['dist_st_value']=np.round(life_star_basic['dist_st_value'],2)
     #null value treatment: plx_value has masked entries therefore distance_values too
     #ref:
     life_star_basic['dist_st_ref']=MaskedColumn(dtype=object,length=len(life_star_basic),
-                                    mask=[True for j in range(len(life_star_basic))])
-    life_star_basic['dist_st_ref'][np.where(life_star_basic['dist_st_value'].mask==False)]= \
-            [life['provider']['provider_name'][0] for j in range(len(
-                life_star_basic['dist_st_ref'][np.where(life_star_basic['dist_st_value'].mask==False)]))]
+                                    mask=True)
+    life_star_basic['dist_st_ref'][np.invert(life_star_basic['dist_st_value'].mask)]= \
+            life_name
     # can I do the same transformation with the errors? -> try on some examples and compare to simbad ones
-    life_star_basic['coo_gal_err_angle']=[-1
-                        for j in range(len(life_star_basic))]
-    life_star_basic['coo_gal_err_maj']=[-1
-                        for j in range(len(life_star_basic))]
-    life_star_basic['coo_gal_err_min']=[-1
-                        for j in range(len(life_star_basic))]
-    life_star_basic['coo_gal_qual']=['?'
-                        for j in range(len(life_star_basic))]
+    life_star_basic['coo_gal_err_angle']=np.full(len(life_star_basic),-1)
+    life_star_basic['coo_gal_err_maj']=np.full(len(life_star_basic),-1)
+    life_star_basic['coo_gal_err_min']=np.full(len(life_star_basic),-1)
+    life_star_basic['coo_gal_qual']=np.full(len(life_star_basic),'?')
     life_star_basic['main_id']=life_star_basic['main_id'].astype(str)
     # source
     # transformed from simbad ircs coordinates using astropy
-    life_star_basic['coo_gal_ref']=Column(dtype=object,length=len(life_star_basic))
-    life_star_basic['coo_gal_ref']=life['provider']['provider_name'][0] 
     #for all entries since coo_gal column not masked column
-             
-    life_star_basic['coo_gal_ref']=life_star_basic['coo_gal_ref'].astype(str)
+    life_star_basic['coo_gal_ref']=np.full(len(life_star_basic),life_name)
     life_star_basic=life_star_basic['main_id','coo_gal_l','coo_gal_b','coo_gal_err_angle',
                                    'coo_gal_err_maj','coo_gal_err_min','coo_gal_qual',
                                    'coo_gal_ref','dist_st_value','dist_st_ref','sptype_string']
     
 
-    life_star_basic=sptype_string_to_class(life_star_basic,
-                                           life['provider']['provider_name'][0])
+    life_star_basic=sptype_string_to_class(life_star_basic,life_name)
     return life_star_basic
 
 def create_life_helpertable(life):  
@@ -338,8 +277,8 @@ def create_mes_teff_st_table(life_helptab,life):
     """
     life_mes_teff_st=life_helptab['main_id','mod_Teff']
     life_mes_teff_st.rename_column('mod_Teff','teff_st_value')
-    life_mes_teff_st['teff_st_qual']=['D' for i in range(len(life_mes_teff_st))]
-    life_mes_teff_st['teff_st_ref']=['2013ApJS..208....9P' for i in range(len(life_mes_teff_st))]
+    life_mes_teff_st['teff_st_qual']=np.full(len(life_mes_teff_st),'D')
+    life_mes_teff_st['teff_st_ref']=np.full(len(life_mes_teff_st),'2013ApJS..208....9P')
     return life_mes_teff_st
 
 def create_mes_radius_st_table(life_helptab,life):
@@ -355,8 +294,8 @@ def create_mes_radius_st_table(life_helptab,life):
     """
     life_mes_radius_st=life_helptab['main_id','mod_R']
     life_mes_radius_st.rename_column('mod_R','radius_st_value')
-    life_mes_radius_st['radius_st_qual']=['D' for i in range(len(life_mes_radius_st))]
-    life_mes_radius_st['radius_st_ref']=['2013ApJS..208....9P' for i in range(len(life_mes_radius_st))]
+    life_mes_radius_st['radius_st_qual']=np.full(len(life_mes_radius_st),'D')
+    life_mes_radius_st['radius_st_ref']=np.full(len(life_mes_radius_st),'2013ApJS..208....9P')
     return life_mes_radius_st
 
 def create_mes_mass_st_table(life_helptab,life):
@@ -372,8 +311,8 @@ def create_mes_mass_st_table(life_helptab,life):
     """
     life_mes_mass_st=life_helptab['main_id','mod_M']
     life_mes_mass_st.rename_column('mod_M','mass_st_value')
-    life_mes_mass_st['mass_st_qual']=['D' for i in range(len(life_mes_mass_st))]
-    life_mes_mass_st['mass_st_ref']=['2013ApJS..208....9P' for i in range(len(life_mes_mass_st))]
+    life_mes_mass_st['mass_st_qual']=np.full(len(life_mes_mass_st),'D')
+    life_mes_mass_st['mass_st_ref']=np.full(len(life_mes_mass_st),'2013ApJS..208....9P')
     
     #specifying stars cocerning multiplicity
     #main sequence simbad object type: MS*, MS? -> luminocity class
@@ -32,24 +32,28 @@ def create_sdb_helpertable(distance_cut_in_pc,sdb_ref,data):
     #transforming from string type into object to have variable length
     sdb_helptab=stringtoobject(sdb_helptab,212)
     #removing objects with plx_value=='None' or masked entries
-    if len(sdb_helptab['plx_value'].mask.nonzero()[0])>0:
+    if np.any(sdb_helptab['plx_value'].mask):
         print('careful, masked entries in plx_value')
 
     #sorting out everything with plx_value too big
     sdb_helptab=sdb_helptab[np.where(sdb_helptab['plx_value']>plx_in_mas_cut)]
     #adds the column for object type
-    sdb_helptab['type']=['di' for j in range(len(sdb_helptab))]
-    sdb_helptab['disks_ref']=[sdb_ref
-                        for j in range(len(sdb_helptab))]
+    sdb_helptab['type']=np.full(len(sdb_helptab),'di')
+    sdb_helptab['disks_ref']=np.full(len(sdb_helptab),sdb_ref)
     #making sure identifiers are unique
-    ind=sdb_helptab.group_by('id').groups.indices
-    for i in range(len(ind)-1):
-        l=ind[i+1]-ind[i]
-        if l==2:
-            sdb_helptab['id'][ind[i]]=sdb_helptab['id'][ind[i]]+'a'
-            sdb_helptab['id'][ind[i]+1]=sdb_helptab['id'][ind[i]+1]+'b'
-        if l>2:
-            print('more than two disks with same name')
+    ids=np.asarray(sdb_helptab['id']).astype(str)
+    _,group,counts=np.unique(ids,return_inverse=True,
+                             return_counts=True)
+    #position of each row within its group of identical ids
+    order=np.argsort(group,kind='stable')
+    position=np.empty(len(ids),dtype=int)
+    position[order]=np.arange(len(ids))-np.repeat(np.cumsum(counts)-counts,
+                                                   counts)
+    double=counts[group]==2
+    sdb_helptab['id'][double]=np.char.add(ids[double],
+                                np.where(position[double]==0,'a','b'))
+    if np.any(counts>2):
+        print('more than two disks with same name')
     #fetching updated main identifier of host star from simbad
     sdb_helptab.rename_column('main_id','sdb_host_main_id')
     sdb_helptab=fetch_main_id(sdb_helptab,
@@ -127,7 +131,7 @@ def create_disk_basic_table(sdb_helptab):
     """
     disk_basic=sdb_helptab['id','rdisk_bb','e_rdisk_bb','disks_ref']    
     for column in ['rdisk_bb','e_rdisk_bb']:
-        if len(sdb_helptab[column].mask.nonzero()[0])>0:
+        if np.any(sdb_helptab[column].mask):
             print('careful, masked entries in ', column)
     disk_basic.rename_columns(['id','rdisk_bb','e_rdisk_bb','disks_ref'],
                                  ['main_id','rad_value','rad_err','rad_ref'])
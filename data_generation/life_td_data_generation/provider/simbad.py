@@ -8,7 +8,7 @@ from datetime import datetime
 
 #self created modules
 from utils.io import save
-from provider.utils import fetch_main_id, OidCreator, fill_sources_table, create_sources_table, query, nullvalues, replace_value, create_provider_table
+from provider.utils import fetch_main_id, OidCreator, fill_sources_table, create_sources_table, query, nullvalues, replace_value, create_provider_table, unique_by_key
 from sdata import empty_cat
 
 def create_simbad_helpertable(distance_cut_in_pc,sim,test_objects):
@@ -91,56 +91,51 @@ def create_simbad_helpertable(distance_cut_in_pc,sim,test_objects):
     test_objects=np.array(test_objects)
     if len(test_objects)>0:
         print('in sim through plx query', 
-                  test_objects[np.where(np.in1d(test_objects,
-                                                sim_helptab['main_id']))])
+                  test_objects[np.isin(test_objects,
+                                        sim_helptab['main_id'])])
         print('in sim through child plx query', 
-                test_objects[np.where(np.in1d(test_objects,
-                                            parents_without_plx['main_id']))])
+                test_objects[np.isin(test_objects,
+                                        parents_without_plx['main_id'])])
         print('in sim through parent plx query', 
-                  test_objects[np.where(np.in1d(test_objects,
-                                            children_without_plx['main_id']))])
+                test_objects[np.isin(test_objects,
+                                        children_without_plx['main_id'])])
     
     #adding of no_parallax objects to rest of simbad query objects
     
-    sim_helptab=vstack([sim_helptab,parents_without_plx])
-    sim_helptab=vstack([sim_helptab,children_without_plx])
+    sim_helptab=vstack([sim_helptab,parents_without_plx,
+                        children_without_plx])
     
     print(' sorting object types...')
 
     #sorting from object type into star, system and planet type
-    sim_helptab['type']=['None' for i in range(len(sim_helptab))]
-    sim_helptab['binary_flag']=['False' for i in range(len(sim_helptab))]
-    to_remove_list=[]
-    removed_otypes=[]
-    for i in range(len(sim_helptab)):
-        #planets
-        if "Pl" in sim_helptab['otypes'][i]:
-            sim_helptab['type'][i]='pl'
-        #stars
-        elif "*" in sim_helptab['otypes'][i]:
-            #system containing multiple stars
-            if "**" in sim_helptab['otypes'][i]:
-                sim_helptab['type'][i]='sy'
-                sim_helptab['binary_flag'][i]='True'
-            #individual stars
-            else:
-                sim_helptab['type'][i]='st'
-        else:
-            removed_otypes.append(sim_helptab['otypes'][i])
-            #most likely single brown dwarfs
-            #storing information for later removal from table called simbad
-            to_remove_list.append(i)
-    #removing any objects that are neither planet, star nor system in type
-    if to_remove_list!=[]:
+    otypes=sim_helptab['otypes']
+    #plain array so no masked element dispatch happens in the string scans
+    if type(otypes)==MaskedColumn:
+        otypes=otypes.filled('')
+    otypes=np.asarray(otypes,dtype=str)
+    is_planet=np.char.find(otypes,'Pl')>=0
+    #system containing multiple stars
+    is_system=np.char.find(otypes,'**')>=0
+    is_star=np.char.find(otypes,'*')>=0
+    sim_helptab['type']=np.select([is_planet,is_system,is_star],
+                                  ['pl','sy','st'],'None')
+    sim_helptab['binary_flag']=np.where(is_system & np.invert(is_planet),
+                                        'True','False')
+    #objects that are neither planet, star nor system in type,
+    #most likely single brown dwarfs
+    to_remove=sim_helptab['type']=='None'
+    #removing them from table
+    if np.any(to_remove):
+        removed_otypes=otypes[to_remove]
         print('removing',len(removed_otypes),' objects that had object types:',
-              list(set(removed_otypes)))
-        print('example object of them:', sim_helptab['main_id'][to_remove_list[0]])
-        sim_helptab.remove_rows(to_remove_list)
+              list(set(removed_otypes.tolist())))
+        print('example object of them:', sim_helptab['main_id'][to_remove][0])
+        sim_helptab=sim_helptab[np.invert(to_remove)]
         
     if len(test_objects)>0:
         print('in sim through otype criteria', 
-                  test_objects[np.where(np.in1d(test_objects,
-                                                sim_helptab['main_id']))])
+                  test_objects[np.isin(test_objects,
+                                        sim_helptab['main_id'])])
 
     return sim_helptab
 
@@ -169,21 +164,19 @@ def stars_in_multiple_system(cat,sim_h_link,all_objects):
     #this should work if alias works well
     #need parent_main_id for sim_h_link here. but setdiff does 
     #not support that.
-    parents=sim_h_link['parent_main_id','main_id','h_link_ref'][:]
+    #selecting columns already returns a new table, no further copy needed
+    parents=sim_h_link['parent_main_id','main_id','h_link_ref']
     parents.rename_column('main_id','child_main_id')
     parents.rename_column('parent_main_id','main_id')
-    sy_wo_child=setdiff(cat['main_id','type','sptype_string'][:],
-                                 parents[:],keys=['main_id'])
+    systems=cat['main_id','type','sptype_string']
+    sy_wo_child=setdiff(systems,parents,keys=['main_id'])
     #that don t have children: sy_wo_child['main_id','type']
     #list of those with children
-    sy_w_child=join(parents[:],
-                            cat['main_id','type','sptype_string'][:],
-                            keys=['main_id'])
+    sy_w_child=join(parents,systems,keys=['main_id'])
     #list of those with children joined with type of child
     all_objects.rename_columns(['type','main_id'],
                                 ['child_type','child_main_id'])
-    sy_w_child=join(sy_w_child[:],
-                            all_objects['child_type','child_main_id'][:],
+    sy_w_child=join(sy_w_child,all_objects['child_type','child_main_id'],
                              keys=['child_main_id'],join_type='left')
     #remove all where type child is not pl
     sy_w_child_pl=sy_w_child[np.where(sy_w_child['child_type']=='pl')]
@@ -192,21 +185,14 @@ def stars_in_multiple_system(cat,sim_h_link,all_objects):
         sy_wo_child_st=sy_wo_child
     else:
         #join with list of sy that dont habe children
-        sy_wo_child_st=vstack([sy_wo_child[:],sy_w_child_pl[:]])
+        sy_wo_child_st=vstack([sy_wo_child,sy_w_child_pl])
         sy_wo_child_st.remove_column('child_type')
     #systems that don t have children except planets: sy_wo_child_st
     #no + in sptype_string because that is another indication of binarity
-    temp=[len(i.split('+'))==1 for i in sy_wo_child_st['sptype_string']]
-    #have it as an array of bools 
-    temp=np.array(temp)
-    #have it as lisit of indices 
-    temp=list(np.where(temp==True)[0])
-    single_sptype=sy_wo_child_st[:][temp]
+    sptypes=np.asarray(sy_wo_child_st['sptype_string'],dtype=str)
+    single_sptype=sy_wo_child_st[np.char.find(sptypes,'+')<0]
     #and no + in spectral type: single_sptype['main_id','type']      
-    cat['type'][np.where(np.in1d(cat['main_id'],
-                                single_sptype['main_id']))]=\
-              ['st' for j in range(len(cat[np.where(np.in1d(cat['main_id'],
-                                        single_sptype['main_id']))]))]        
+    cat['type'][np.isin(cat['main_id'],single_sptype['main_id'])]='st'
     return cat
 
 def creating_helpertable_stars(sim_helptab,sim):
@@ -220,9 +206,9 @@ def creating_helpertable_stars(sim_helptab,sim):
     :returns: Helper table.
     :rtype: astropy.table.table.Table
     """    
-    temp_stars=sim_helptab[np.where(sim_helptab['type']!='pl')]
+    temp_stars=sim_helptab[sim_helptab['type']!='pl']
     #removing double objects (in there due to multiple parents)
-    stars=Table(unique(temp_stars,keys='main_id'),copy=True)
+    stars=unique_by_key(temp_stars,'main_id')
     return stars
 
 def expanding_helpertable_stars(sim_helptab,sim,stars):
@@ -242,18 +228,17 @@ def expanding_helpertable_stars(sim_helptab,sim,stars):
     #updating multiplicity object type
     #no children and sptype does not contain + -> type needs to be st
 
+    sim_bibcode=sim['provider']['provider_bibcode'][0]
     #all objects in stars table: stars['main_id','type']
-    stars[np.where(stars['type']=='sy')]=stars_in_multiple_system(
-            stars[np.where(stars['type']=='sy')],sim['h_link'][:],
-            sim_helptab['main_id','type'][:])    
+    sy_rows=stars['type']=='sy'
+    stars[sy_rows]=stars_in_multiple_system(stars[sy_rows],sim['h_link'],
+            sim_helptab['main_id','type'])
     
     # binary_flag 'True' for all stars with parents
     # meaning stars[main_id] in sim_h_link[child_main_id] 
     #-> stars[binary_flag]=='True'    
-    stars['binary_flag'][np.where(np.in1d(stars['main_id'],
-                                        sim['h_link']['main_id']))]=\
-                    ['True' for j in range(len(stars[np.where(
-                    np.in1d(stars['main_id'],sim['h_link']['main_id']))]))]   
+    stars['binary_flag'][np.isin(stars['main_id'],
+                                 sim['h_link']['main_id'])]='True'
                 
     #change null value of plx_qual
     stars['plx_qual']=stars['plx_qual'].astype(object)
@@ -263,22 +248,16 @@ def expanding_helpertable_stars(sim_helptab,sim,stars):
         #initiate some of the ref columns
         stars[f'mag_{band}_ref']=MaskedColumn(dtype=object,
                                     length=len(stars),
-                                    mask=[True for j in range(len(stars))])
+                                    mask=True)
         #add simbad reference where no other is given
-        stars[f'mag_{band}_ref'][np.where(
-                stars[f'mag_{band}_value'].mask==False)]=[
-                sim['provider']['provider_bibcode'][0] for j in range(len(
-                stars[f'mag_{band}_ref'][np.where(
-                stars[f'mag_{band}_value'].mask==False)]))]
+        stars[f'mag_{band}_ref'][np.invert(stars[f'mag_{band}_value'].mask)]=\
+                sim_bibcode
         
-    stars=replace_value(stars,'plx_ref','',sim['provider']['provider_bibcode'][0])
-    stars=replace_value(stars,'sptype_ref','',
-            sim['provider']['provider_bibcode'][0])
-    stars=replace_value(stars,'coo_ref','',sim['provider']['provider_bibcode'][0])
+    for ref_column in ['plx_ref','sptype_ref','coo_ref']:
+        stars=replace_value(stars,ref_column,'',sim_bibcode)
         
-    stars['binary_ref']=[sim['provider']['provider_bibcode'][0] for j in range(
-            len(stars))]
-    stars['binary_qual']=['D' for j in range(len(stars))]
+    stars['binary_ref']=np.full(len(stars),sim_bibcode)
+    stars['binary_qual']=np.full(len(stars),'D')
     return stars
 
 def create_ident_table(sim_helptab,sim):
@@ -298,8 +277,8 @@ def create_ident_table(sim_helptab,sim):
                     JOIN TAP_UPLOAD.t1 ON oidref=t1.oid"""
     sim_ident=query(sim['provider']['provider_url'][0],upload_query,
                     [sim_helptab['oid','main_id'][:].copy()]) #adds column id
-    sim_ident['id_ref']=[sim['provider']['provider_bibcode'][0] \
-                            for j in range(len(sim_ident))]
+    sim_ident['id_ref']=np.full(len(sim_ident),
+                                sim['provider']['provider_bibcode'][0])
     sim_ident.remove_column('oid')
     return sim_ident
 
@@ -323,11 +302,13 @@ def create_h_link_table(sim_helptab,sim,stars):
     # removing entries in h_link where parent objects are clusters or 
     # associations as we are 
     #only interested in hierarchical multiples. 
-    sim_h_link=sim_h_link[np.where(np.in1d(sim_h_link['parent_oid'],
-                                            stars['oid']))]
+    sim_h_link=sim_h_link[np.isin(sim_h_link['parent_oid'],stars['oid'])]
     
     
-    sim_h_link=fetch_main_id(sim_h_link,OidCreator(name='parent_main_id',colname='parent_oid'))
+    #stars already contains the oid of all remaining parents
+    sim_h_link=fetch_main_id(sim_h_link,OidCreator(name='parent_main_id',
+                                                   colname='parent_oid'),
+                             local_map=stars['oid','main_id'])
     sim_h_link.remove_column('parent_oid')
     #typeconversion needed as smallint fill value != int null value
     sim_h_link['membership']=sim_h_link['membership'].astype(int)
@@ -350,13 +331,11 @@ def create_objects_table(sim_helptab,stars):
     """
     #-----------------creating output table sim_planets-----------------
     temp_sim_planets=sim_helptab['main_id','ids',
-                            'type'][np.where(sim_helptab['type']=='pl')]
-    sim_planets=Table(unique(
-                    temp_sim_planets,keys='main_id'),copy=True)
+                            'type'][sim_helptab['type']=='pl']
+    sim_planets=unique_by_key(temp_sim_planets,'main_id')
     #-----------------creating output table sim_objects-----------------
     sim_objects=vstack([sim_planets['main_id','ids','type'],
                              stars['main_id','ids','type']])
-    sim_objects['ids']=sim_objects['ids'].astype(object)
     #tbd: add identifier simbad main_id without leading * and whitespaces
     return sim_objects
 
@@ -396,10 +375,8 @@ def create_star_basic_table(stars):
                          'mag_k_value','mag_k_ref',
                          'sptype_string','sptype_qual','sptype_ref',
                          'plx_value','plx_err','plx_qual','plx_ref']
-    # changing type from object to string for later join functions
-    sim_star_basic['sptype_string']=sim_star_basic['sptype_string'].astype(str)
-    sim_star_basic['sptype_qual']=sim_star_basic['sptype_qual'].astype(str)
-    sim_star_basic['sptype_ref']=sim_star_basic['sptype_ref'].astype(str)
+    # object type columns are changed to string type for later join
+    # functions when the table is saved
     return sim_star_basic
 
 def provider_simbad(distance_cut_in_pc,test_objects=[]):
@@ -7,9 +7,11 @@ from pyvo.dal import TAPService
 from astropy.table import Table, column, unique, vstack, join, table
 from datetime import datetime
 from typing import List
+import hashlib
+import os
 
 #self created modules
-from utils.io import load
+from utils.io import cached_load, Path
 
 
 def create_provider_table(provider_name,provider_url,provider_bibcode,provider_access = datetime.now().strftime('%Y-%m-%d')):
@@ -21,7 +23,43 @@ def create_provider_table(provider_name,provider_url,provider_bibcode,provider_a
     provider_table['provider_access']=[provider_access]
     return provider_table
     
-def query(link: str,adql_query: str,upload_tables: List[table.Table]=[]) -> table.Table:
+def query_cache_path(link: str,adql_query: str,cache_dir: str=None) -> str:
+    """
+    Returns the location under which the result of a query is cached.
+    
+    :param str link: Service access URL.
+    :param str adql_query: Query in ADQL.
+    :param cache_dir: Directory of the cached votables, defaults to 
+        tap_cache in the additional data directory.
+    :type cache_dir: str, optional
+    :returns: Path of the cached votable.
+    :rtype: str
+    """
+    if cache_dir is None:
+        cache_dir=f'{Path().additional_data}tap_cache/'
+    key=hashlib.sha1((link+adql_query).encode()).hexdigest()
+    return os.path.join(cache_dir,f'tap_{key}.xml')
+
+def save_query_cache(cat: table.Table,link: str,adql_query: str,
+                     cache_dir: str=None):
+    """
+    Stores the result of a query so that reruns can skip the network.
+    
+    :param cat: Result of the query.
+    :type cat: astropy.table.table.Table
+    :param str link: Service access URL.
+    :param str adql_query: Query in ADQL.
+    :param cache_dir: Directory of the cached votables, defaults to 
+        tap_cache in the additional data directory.
+    :type cache_dir: str, optional
+    """
+    path=query_cache_path(link,adql_query,cache_dir)
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+    cat.write(path,format='votable',tabledata_format='binary2',overwrite=True)
+    return
+
+def query(link: str,adql_query: str,upload_tables: List[table.Table]=[],
+          cache: bool=False,cache_dir: str=None) -> table.Table:
     """
     Performs a query via TAP on the service given in the link parameter.
     
@@ -34,10 +72,20 @@ def query(link: str,adql_query: str,upload_tables: List[table.Table]=[]) -> tabl
     :param upload_tables: List of astropy tables to be uploaded to the 
         service.
     :type upload_tables: list(astropy.table.table.Table)
+    :param cache: If True the result of a query without upload tables is
+        stored on disk and reused for identical queries, defaults to False.
+    :type cache: bool, optional
+    :param cache_dir: Directory of the cached votables, defaults to 
+        tap_cache in the additional data directory.
+    :type cache_dir: str, optional
     :returns: Result of the query.
     :rtype: astropy.table.table.Table
     """
     
+    cache=cache and upload_tables==[]
+    if cache and os.path.exists(query_cache_path(link,adql_query,cache_dir)):
+        return Table.read(query_cache_path(link,adql_query,cache_dir),
+                          format='votable')
     service = TAPService(link)
     if upload_tables==[]:
         result=service.run_async(adql_query.format(**locals()), maxrec=1600000)
@@ -47,7 +95,10 @@ def query(link: str,adql_query: str,upload_tables: List[table.Table]=[]) -> tabl
             tables.update({f"t{i+1}":upload_tables[i]})
         result = service.run_async(adql_query,uploads=tables,timeout=None,
                                    maxrec=1600000)   
-    return result.to_table()
+    cat=result.to_table()
+    if cache:
+        save_query_cache(cat,link,adql_query,cache_dir)
+    return cat
 
 def remove_catalog_description(cat: table.Table) -> table.Table: 
     """
@@ -67,6 +118,30 @@ def remove_catalog_description(cat: table.Table) -> table.Table:
             cat[col].description=''     
     return cat
 
+def _collect_references(cat,ref_columns):
+    """
+    Gathers the references of the given columns into one array.
+    
+    :param cat: Table on which the references should be gathered.
+    :type cat: astropy.table.table.Table
+    :param ref_columns: Header of the columns containing reference 
+        information.
+    :type ref_columns: list(str)
+    :return: References, masked entries are skipped.
+    :rtype: numpy.ndarray
+    """
+    #initialization of list to store the reference arrays
+    cat_reflist=[] 
+    #for all the columns given add reference information 
+    for ref_column in ref_columns:
+        col=cat[ref_column]
+        #In case the column has elements that are masked skip those
+        if type(col)==column.MaskedColumn:
+            cat_reflist.append(col.compressed())
+        else:
+            cat_reflist.append(np.asarray(col))
+    return np.concatenate(cat_reflist).astype(str)
+
 def fill_sources_table(cat: table.Table,ref_columns: List[str],provider: str,old_sources: table.Table=Table()) -> table.Table:
     """
     Creates or updates the source table out of the given references.
@@ -90,37 +165,44 @@ def fill_sources_table(cat: table.Table,ref_columns: List[str],provider: str,old
         # table initialization to prevent error messages when assigning 
         # columns
         cat_sources=Table() 
-        #initialization of list to store reference information
-        cat_reflist=[] 
-        #for all the columns given add reference information 
-        for k in range(len(ref_columns)):
-            #In case the column has elements that are masked skip those
-            if type(cat[ref_columns[k]])==column.MaskedColumn:
-                cat_reflist.extend(
-                    cat[ref_columns[k]][np.where(
-                            cat[ref_columns[k]].mask==False)])
-            else:
-                cat_reflist.extend(cat[ref_columns[k]])
-        # add list of collected references to the table and call the 
+        # add collected references as one array to the table and call the 
         # column ref
-        cat_sources['ref']=cat_reflist
-        cat_sources=unique(cat_sources)
+        cat_sources['ref']=_collect_references(cat,ref_columns)
         #attaches service information
-        cat_sources['provider_name']=[provider for j in range(
-                len(cat_sources))]
+        cat_sources['provider_name']=np.full(len(cat_sources),provider)
         #combine old and new sources into one table
         sources=vstack([old_sources,cat_sources])
-        sources=unique(sources) #remove double entries
+        #remove double entries, covers those within cat_sources too
+        sources=unique(sources,keys=['ref','provider_name'])
     else:
         sources=old_sources
     return sources
 
 def create_sources_table(tables,ref_columns,provider_name):
+    """
+    Creates the source table out of the references of several tables.
+    
+    The references of all tables are gathered first so that the
+    table is built and made unique only once.
+    
+    :param tables: Tables on which the references should be gathered.
+    :type tables: list(astropy.table.table.Table)
+    :param ref_columns: Header of the columns containing reference 
+        information, one list per table.
+    :type ref_columns: list(list(str))
+    :param str provider_name: Provider name.
+    :return: Table containing references and provider information.
+    :rtype: astropy.table.table.Table
+    """
     #--------------creating output table sim_sources -------------------
+    reflist=[_collect_references(cat,ref)
+             for cat,ref in zip(tables,ref_columns) if len(cat)>0]
+    if len(reflist)==0:
+        return Table()
     sources=Table()
-    for cat,ref in zip(tables,ref_columns):
-        sources=fill_sources_table(cat,ref,provider_name,sources)
-    return sources
+    sources['ref']=np.concatenate(reflist)
+    sources['provider_name']=np.full(len(sources),provider_name)
+    return unique(sources,keys=['ref','provider_name'])
 
 class OidCreator:
     """
@@ -129,6 +211,8 @@ class OidCreator:
     def __init__(self,name,colname):
         self.name=name
         self.colname=colname
+        #column of a local SIMBAD table corresponding to colname
+        self.map_key='oid'
         
     def create_main_id_query(self):
         return 'SELECT b.main_id AS '+self.name+""",t1.*
@@ -142,6 +226,8 @@ class IdentifierCreator:
     def __init__(self,name,colname):
         self.name=name
         self.colname=colname
+        #column of a local SIMBAD table corresponding to colname
+        self.map_key='id'
         
     def create_main_id_query(self):
         return 'SELECT b.main_id AS '+self.name+""",t1.*
@@ -151,21 +237,33 @@ class IdentifierCreator:
     
 #looks better but don't think this will run. issue is that I pass variables to a class that doesn't take any
 
-def fetch_main_id(cat: table.Table, id_creator=OidCreator(name='main_id',colname='oid')) -> table.Table:
+def fetch_main_id(cat: table.Table, id_creator=OidCreator(name='main_id',colname='oid'), local_map: table.Table=None) -> table.Table:
     """
     Joins main_id from simbad to the column colname. 
     
     Returns the whole table cat but without any rows where no simbad 
-    main_id was found.
+    main_id was found. If the SIMBAD mapping is already available in
+    memory it is joined locally instead of querying SIMBAD.
     
     :param cat: Astropy table containing column colname.
     :type cat: astropy.table.table.Table
     :param id_creator: OidCreator or IdentifierCreator object.
+    :param local_map: Table containing the columns main_id and oid (for 
+        OidCreator) or id (for IdentifierCreator), defaults to None.
+    :type local_map: astropy.table.table.Table
     :return: Table with all main SIMBAD identifiers that could be found 
         in column "name".
     :rtype: astropy.table.table.Table
     """
     
+    if local_map is not None:
+        mapping=local_map[id_creator.map_key,'main_id']
+        #two steps in case name or colname coincide with the original ones
+        mapping.rename_columns([id_creator.map_key,'main_id'],
+                               ['temp_key','temp_main_id'])
+        mapping.rename_columns(['temp_main_id','temp_key'],
+                               [id_creator.name,id_creator.colname])
+        return join(mapping,cat,keys=id_creator.colname)
     #improvement idea to be performed at one point
     # tbd option to match on position instead of main_id or oid
     #SIMBAD TAP service
@@ -180,27 +278,95 @@ def distance_cut(cat: table.Table, colname: str, main_id: bool=True):
     Sorts out objects not within the provider_simbad distance cut. 
     
     :param cat: Astropy table to be matched against sim_objects table.
+        Apart from colname it should not contain a column called main_id
+        or, if main_id is False, id.
     :type cat: astropy.table.table.Table
     :param str colname: Name of the column to use for the match.
+    :param bool main_id: If True colname is matched against the SIMBAD
+        main_id, else against all SIMBAD identifiers in which case the 
+        SIMBAD main_id is added as column main_id. Defaults to True.
     :return: Table like cat without any objects not found in 
         sim_objects.
     :rtype: astropy.table.table.Table
     """
     
+    #only the key columns are loaded so nothing needs to be renamed to
+    #avoid name conflicts
     if main_id:
-        [sim]=load(['sim_objects'])
-        sim.rename_columns(['main_id','ids'],['temp1','temp2'])
-        cat=join(cat,sim['temp1','temp2'],
-                      keys_left=colname,keys_right='temp1')
-        cat.remove_columns(['temp1','temp2'])
+        [sim]=cached_load(['sim_objects'],columns=[['main_id']])
+        key='main_id'
+    else:
+        [sim]=cached_load(['sim_ident'],columns=[['id','main_id']])
+        key='id'
+    if colname==key:
+        cat=join(cat,sim,keys=key)
     else:
-        [sim]=load(['sim_ident'])
-        sim.rename_columns(['id'],['temp1'])
-        cat=join(cat,sim['temp1','main_id'],
-                      keys_left=colname,keys_right='temp1')
-        cat.remove_columns(['temp1'])
+        cat=join(cat,sim,keys_left=colname,keys_right=key)
+        cat.remove_column(key)
     return cat
 
+def unique_by_key(cat: table.Table, key: str) -> table.Table:
+    """
+    Keeps the first row for each value of the column key.
+    
+    Same result as astropy.table.unique(cat,keys=key) but the rows are 
+    selected with np.unique instead of grouping the whole table.
+    
+    :param cat: Astropy table containing the column key.
+    :type cat: astropy.table.table.Table
+    :param str key: Name of the column whose values should be unique.
+    :return: Table sorted by key with one row per key value.
+    :rtype: astropy.table.table.Table
+    """
+    
+    #grouping treats masked keys separately, leave that case to astropy
+    if np.ma.is_masked(cat[key]):
+        return unique(cat,keys=key)
+    #np.unique returns the index of the first occurrence of each value
+    index=np.unique(np.asarray(cat[key]),return_index=True)[1]
+    return cat[index]
+
+def unique_rows(cat: table.Table) -> table.Table:
+    """
+    Keeps the first of each set of identical rows.
+    
+    Same result as astropy.table.unique(cat,silent=True), including 
+    NaN values never being equal to each other. Instead of grouping the 
+    table each column is converted into integer codes and duplicates are 
+    found by comparing neighbouring rows after one lexsort of the codes.
+    
+    :param cat: Astropy table.
+    :type cat: astropy.table.table.Table
+    :return: Table sorted by its columns without duplicate rows.
+    :rtype: astropy.table.table.Table
+    """
+    
+    #like unique, columns containing masked values are no keys
+    keys=[colname for colname in cat.colnames
+          if not np.ma.is_masked(cat[colname])]
+    if len(cat)==0 or keys==[]:
+        return unique(cat,silent=True)
+    try:
+        codes=[np.unique(np.asarray(cat[key]),return_inverse=True)[1]
+               for key in keys]
+    except TypeError:
+        #values that can not be ordered, leave that case to astropy
+        return unique(cat,silent=True)
+    #lexsort uses the last key as primary one and is stable
+    order=np.lexsort(codes[::-1])
+    #a row is kept if it differs from the previous one in any key
+    first=np.zeros(len(cat),dtype=bool)
+    first[0]=True
+    for code in codes:
+        sorted_code=code[order]
+        first[1:]|=sorted_code[1:]!=sorted_code[:-1]
+    #np.unique gives all NaN the same code, which is fine for sorting but
+    #like in astropy a row containing NaN never equals the previous one
+    for key in keys:
+        if cat[key].dtype.kind in 'fc':
+            first|=np.isnan(np.asarray(cat[key]))[order]
+    return cat[order[first]]
+
 def nullvalues(cat,colname,nullvalue,verbose=False):
     """
     This function fills masked entries specified column. 
@@ -229,21 +395,35 @@ def replace_value(cat,column,value,replace_by):
     """
     This function replaces values.
     
+    All entries to be replaced are collected first so that the column
+    is only written to once.
+    
     :param cat: Table containing column specified as colname.
     :type cat: astropy.table.table.Table
     :param str column: Designates column in which to replace the 
         entries.
-    :param value: Entry to be replaced.
-    :type value: str or float or bool
+    :param value: Entry or list of entries to be replaced.
+    :type value: str or float or bool or list
     :param replace_by: Entry to be put in place of param value.
     :type replace_by: str or float or bool
     :return: Table with replaced entries.
     :rtype: astropy.table.table.Table
     """
     
-    cat[column][np.where(cat[column]==value)]= \
-            [replace_by for i in range(
-        len(cat[column][np.where(cat[column]==value)]))]
+    if type(value)!=list:
+        value=[value]
+    kind=cat[column].dtype.kind
+    mask=np.zeros(len(cat),dtype=bool)
+    for entry in value:
+        # entries of another type than the column, e.g. a string in a 
+        # float column, can not occur in it and are not compared
+        if kind in 'US' and not isinstance(entry,str):
+            continue
+        if kind not in 'OUS' and isinstance(entry,str):
+            continue
+        mask|=cat[column].data==entry
+    if np.any(mask):
+        cat[column][mask]=replace_by
     return cat
 
 def ids_from_ident(ident,objects):
@@ -262,14 +442,19 @@ def ids_from_ident(ident,objects):
     :rtype: astropy.table.table.Table
     """
     
-    grouped_ident=ident.group_by('main_id')
-    ind=grouped_ident.groups.indices
-    for i in range(len(ind)-1):
+    #sorting a fixed width string copy of main_id lets numpy sort in C 
+    #and avoids grouping (and copying) the whole table
+    main_ids=np.asarray(ident['main_id']).astype(str)
+    order=np.argsort(main_ids,kind='stable')
+    main_ids=main_ids[order]
+    ids=np.asarray(ident['id'])[order]
+    #start index of each main_id group plus the end of the last one
+    ind=np.concatenate([[0],np.flatnonzero(main_ids[1:]!=main_ids[:-1])+1,
+                        [len(main_ids)]]) if len(main_ids)>0 else np.array([0])
     # -1 is needed because else ind[i+1] is out of bonds
-        ids=[]
-        for j in range(ind[i],ind[i+1]):
-            ids.append(grouped_ident['id'][j])
-        ids="|".join(ids)
-        objects.add_row([grouped_ident['main_id'][ind[i]],ids])
-    return objects
+    joined_ids=['|'.join(ids[ind[i]:ind[i+1]]) for i in range(len(ind)-1)]
+    grouped_objects=Table([np.asarray(ident['main_id'])[order][ind[:-1]],
+                           joined_ids],
+                          names=['main_id','ids'],dtype=[object,object])
+    return vstack([objects,grouped_objects])
 
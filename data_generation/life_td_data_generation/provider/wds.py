@@ -7,11 +7,11 @@ from astropy.table import Table, unique, vstack, join
 from datetime import datetime
 
 #self created modules
-from utils.io import save, load
+from utils.io import save, load, cached_load
 from provider.utils import fill_sources_table, create_sources_table, query, ids_from_ident, distance_cut, create_provider_table
 from sdata import empty_cat
 
-def create_wds_helpertable(wds,temp,test_objects): 
+def create_wds_helpertable(wds,temp,test_objects,cache=False): 
     """
     Creates helper table.
     
@@ -23,6 +23,9 @@ def create_wds_helpertable(wds,temp,test_objects):
     :param test_objects: Objects to be tested where they drop out of the 
         criteria or make it till the end.
     :type test_objects: list(str) 
+    :param cache: If True the query result is cached on disk and reused,
+        defaults to False.
+    :type cache: bool, optional
     :returns: Helper table.
     :rtype: astropy.table.table.Table
     """
@@ -42,35 +45,39 @@ def create_wds_helpertable(wds,temp,test_objects):
         # currently temp=True not giving same result because 
         # wds['system_main_id'][j] are '' and not masked
         for col in ['system_main_id','primary_main_id','secondary_main_id']:
-            wds_helptab[col][np.where(wds_helptab[col]=='')]=np.ma.masked
+            wds_helptab[col][wds_helptab[col]=='']=np.ma.masked
         # tbd: add provider_access of last query
     else:
         print(' querying VizieR for WDS...')
-        wds_helptab=query(wds['provider']['provider_url'][0],adql_query[0])
+        wds_helptab=query(wds['provider']['provider_url'][0],adql_query[0],
+                          cache=cache)
         
         # I need to match the wds objects with the simbad ones to inforce the
         # distance cut since wds does not have distance information.
         
         # initializing and setting type for object comparison in later join 
-        for col in ['sim_wds_id','system_name','primary','secondary']:
-            wds_helptab[col]=wds_helptab['wds_name'].astype(object)
+        wds_helptab['sim_wds_id']=wds_helptab['wds_name'].astype(object)
         
         # assigning correct name of system, primary and secondary for each wds object
-        for j in range(len(wds_helptab)):
-            if wds_helptab['wds_comp'][j]=='':#trivial binaries
-                wds_helptab['system_name'][j]='WDS J'+wds_helptab['wds_name'][j]+'AB'
-                #AB added since apparently simbad calls trivial binary system AB too
-                wds_helptab['primary'][j]='WDS J'+wds_helptab['wds_name'][j]+'A'
-                wds_helptab['secondary'][j]='WDS J'+wds_helptab['wds_name'][j]+'B'
-            else:#higer order multiples
-                wds_helptab['system_name'][j]='WDS J'+wds_helptab['wds_name'][j]+wds_helptab['wds_comp'][j]
-                if len(wds_helptab['wds_comp'][j])==2:
-                    wds_helptab['primary'][j]='WDS J'+wds_helptab['wds_name'][j]+wds_helptab['wds_comp'][j][0]
-                    wds_helptab['secondary'][j]='WDS J'+wds_helptab['wds_name'][j]+wds_helptab['wds_comp'][j][1]
-                else:
-                    components=wds_helptab['wds_comp'][j].split(',')
-                    wds_helptab['primary'][j]='WDS J'+wds_helptab['wds_name'][j]+components[0]
-                    wds_helptab['secondary'][j]='WDS J'+wds_helptab['wds_name'][j]+components[1]
+        wds_name=np.char.add('WDS J',
+                             np.ma.filled(wds_helptab['wds_name'],'').astype(str))
+        wds_comp=np.ma.filled(wds_helptab['wds_comp'],'').astype(str)
+        #trivial binaries
+        trivial=wds_comp==''
+        #higer order multiples either given as two letters e.g. 'AC' or as
+        #components separated by a comma e.g. 'AB,C'
+        two_letters=np.char.str_len(wds_comp)==2
+        letters=wds_comp.astype('U2').view('U1').reshape(-1,2)
+        components=np.char.partition(wds_comp,',')
+        #AB added since apparently simbad calls trivial binary system AB too
+        system=np.where(trivial,'AB',wds_comp)
+        primary=np.select([trivial,two_letters],['A',letters[:,0]],
+                          components[:,0])
+        secondary=np.select([trivial,two_letters],['B',letters[:,1]],
+                            components[:,2])
+        wds_helptab['system_name']=np.char.add(wds_name,system).astype(object)
+        wds_helptab['primary']=np.char.add(wds_name,primary).astype(object)
+        wds_helptab['secondary']=np.char.add(wds_name,secondary).astype(object)
         # print('number of trivial binary systems:',
         #   len(wds[np.where(wds['wds_comp']=='')]))
                 
@@ -91,6 +98,13 @@ def create_wds_helpertable(wds,temp,test_objects):
     #    wds=fetch_main_id(wds,colname='wds_full_name',name='main_id',oid=False)
     #    wds=distance_cut(wds,colname='wds_full_name',main_id=True)
         print(' performing distance cut...')
+        #one membership test on the union of all names restricts the three
+        #joins below to the rows that can match at all
+        [sim_ident]=cached_load(['sim_ident'],columns=[['id','main_id']])
+        names=np.concatenate([np.asarray(wds_helptab[col]).astype(str) 
+                              for col in ['system_name','primary','secondary']])
+        known=np.isin(names,np.asarray(sim_ident['id']).astype(str))
+        wds_helptab=wds_helptab[known.reshape(3,-1).any(axis=0)]
         
         #assigning main_id for system using sim_hlink and cutting on the system
         #  or the components
@@ -113,8 +127,7 @@ def create_wds_helpertable(wds,temp,test_objects):
         # this case would I want to assign system_name in system main_id? do it 
         # later
         
-        wds_helptab=vstack([wds_system_cut,wds_primary_cut])
-        wds_helptab=vstack([wds_helptab,wds_secondary_cut])
+        wds_helptab=vstack([wds_system_cut,wds_primary_cut,wds_secondary_cut])
                         
         if len(test_objects)>0:
             print(wds_helptab['system_main_id','primary_main_id','secondary_main_id'])
@@ -135,6 +148,47 @@ def create_wds_helpertable(wds,temp,test_objects):
 
     return wds_helptab
 
+def paired_columns_table(cat,first_columns,second_columns,names):
+    """
+    Stacks pairs of columns of cat into a two column table.
+    
+    Rows where either entry of a pair is masked are left out.
+    
+    :param cat: Table containing all the given columns.
+    :type cat: astropy.table.table.Table
+    :param first_columns: Columns stacked into the first output column.
+    :type first_columns: list(str)
+    :param second_columns: Columns stacked into the second output column,
+        paired element wise with first_columns.
+    :type second_columns: list(str)
+    :param names: Names of the two output columns.
+    :type names: list(str)
+    :returns: Table with the two columns names.
+    :rtype: astropy.table.table.Table
+    """
+    first=np.ma.concatenate([np.ma.asarray(cat[col]).astype(object)
+                             for col in first_columns])
+    second=np.ma.concatenate([np.ma.asarray(cat[col]).astype(object)
+                              for col in second_columns])
+    keep=np.invert(np.ma.getmaskarray(first) | np.ma.getmaskarray(second))
+    return Table([first.data[keep],second.data[keep]],names=names,
+                 dtype=[object,object],masked=True)
+
+def unique_main_id_of_id(ident):
+    """
+    Maps identifiers to their main identifier where that is unique.
+    
+    :param ident: Table containing the columns main_id and id.
+    :type ident: astropy.table.table.Table
+    :returns: Dictionary of id and main_id for all ids belonging to 
+        exactly one main_id.
+    :rtype: dict(str,str)
+    """
+    ids,index,counts=np.unique(np.asarray(ident['id']).astype(str),
+                               return_index=True,return_counts=True)
+    single=counts==1
+    return dict(zip(ids[single],np.asarray(ident['main_id'])[index[single]]))
+
 def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
     """
     Creates identifier and hierarchical link tables.
@@ -150,10 +204,6 @@ def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
     :rtype: astropy.table.table.Table, astropy.table.table.Table
     """
     #-----------------creating output table wds_ident and wds_h_link------------
-    wds_ident=Table(names=['main_id','id'],dtype=[object,object],masked=True)
-    # create wds_h_link (for systems)
-    wds_h_link=Table(names=['main_id','parent_main_id'],dtype=[object,object])
-    #add all relevant invormation
     #about identifiers
     table_main=['system_name','system_main_id','system_main_id',
                'primary','primary_main_id','primary_main_id',
@@ -161,28 +211,15 @@ def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
     table_id=['system_name','system_main_id','system_name',
              'primary','primary_main_id','primary',
              'secondary','secondary_main_id','secondary']
-    empty=Table(names=['main_id'],dtype=[object],masked=True)
-    for id1,id2 in zip(table_main,table_id):
-        temp=empty.copy()
-        temp['main_id']=wds_helptab[id1].astype(object)
-        temp['id']=wds_helptab[id2].astype(object)
-        wds_ident=vstack([wds_ident,temp])
-    
+    wds_ident=paired_columns_table(wds_helptab,table_main,table_id,
+                                   ['main_id','id'])
     #about relations of objects
     table_main_id=['primary','primary','primary_main_id','primary_main_id',
                    'secondary','secondary','secondary_main_id','secondary_main_id']
     table_parent=['system_name','system_main_id','system_name','system_main_id',
                   'system_name','system_main_id','system_name','system_main_id']
-    for id1,id2 in zip(table_main_id,table_parent):
-        temp=empty.copy()
-        temp['main_id']=wds_helptab[id1].astype(object)
-        temp['parent_main_id']=wds_helptab[id2].astype(object)
-        wds_h_link=vstack([wds_h_link,temp])
-    #delete all rows containing masked entries
-    wds_ident.remove_rows(wds_ident['main_id'].mask.nonzero()[0])
-    wds_ident.remove_rows(wds_ident['id'].mask.nonzero()[0])
-    wds_h_link.remove_rows(wds_h_link['main_id'].mask.nonzero()[0])
-    wds_h_link.remove_rows(wds_h_link['parent_main_id'].mask.nonzero()[0])
+    wds_h_link=paired_columns_table(wds_helptab,table_main_id,table_parent,
+                                    ['main_id','parent_main_id'])
 
     #uniqueness
     wds_ident=unique(wds_ident)
@@ -190,8 +227,8 @@ def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
 
     #delete entries where id instead of main_id used
     not_identical_rows_id=wds_ident['id'][np.where(wds_ident['main_id']!=wds_ident['id'])]
-    remove=np.in1d(wds_ident['main_id'],not_identical_rows_id)
-    wds_ident.remove_rows(remove)
+    remove=np.isin(wds_ident['main_id'],not_identical_rows_id)
+    wds_ident=wds_ident[np.invert(remove)]
 
     #for h_link replacing instead of deleting because there can be cases where the information I need is only available this way
     #e.g. simbad query on system name results in system main_id. simbad query on primary gives primary_main_id. but 
@@ -212,11 +249,9 @@ def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
               test_objects[np.where(np.in1d(test_objects,wds_h_link['main_id'][not_main_id]))])
 
     #replace it with the corresponding  ident main_id
-    for j in range(len(wds_h_link['main_id'][not_main_id])):
-        temp=wds_h_link['main_id'][not_main_id][j]
-        #why is this line not working? am I assigning stuff to a copy instead of alias?
-        wds_h_link['main_id'][np.where(wds_h_link['main_id']==temp)]=wds_ident['main_id'][np.where(
-                wds_ident['id']==temp)]
+    main_id_of_id=unique_main_id_of_id(wds_ident)
+    wds_h_link['main_id'][not_main_id]=[main_id_of_id.get(main_id,main_id)
+            for main_id in wds_h_link['main_id'][not_main_id]]
     
     if len(test_objects)>0:
         print('number of test objects that are in h_link main_id \n', \
@@ -227,27 +262,20 @@ def create_ident_and_h_link_table(wds_helptab,wds,test_objects):
     #where h_link parent_main_id not in ident_main_id
     not_parent_main_id=np.invert(np.in1d(wds_h_link['parent_main_id'],wds_ident['main_id']))
 
-    #replace it with the corresponding  ident main_id
-    for j in range(len(wds_h_link['parent_main_id'][not_parent_main_id])):
-        if len(wds_ident['main_id'][np.where(
-                    wds_ident['id']==wds_h_link['parent_main_id'][not_parent_main_id][j])])==1:
-            temp=wds_h_link['parent_main_id'][not_parent_main_id][j]
-            wds_h_link['parent_main_id'][np.where(wds_h_link['parent_main_id']==temp)]=wds_ident['main_id'][np.where(
-                    wds_ident['id']==temp)]
-        #else:
-        #nestled multiples with non hierarchical measurements e.g. AC component when A and B are closest and C further away
-            #print(wds_ident['main_id'][np.where(
-            #        wds_ident['id']==wds_h_link['parent_main_id'][not_parent_main_id][j])])
-            #print(wds_h_link['parent_main_id'][not_parent_main_id][j])
-            #print(wds_h_link['main_id'][not_parent_main_id][j])
-            #wds_h_link['parent_main_id'][not_parent_main_id][j]=wds_ident['main_id'][np.where(
-            #        wds_ident['id']==wds_h_link['parent_main_id'][not_parent_main_id][j])][0]
+    #replace it with the corresponding  ident main_id where that is unique
+    wds_h_link['parent_main_id'][not_parent_main_id]=[
+            main_id_of_id.get(parent_main_id,parent_main_id)
+            for parent_main_id in wds_h_link['parent_main_id'][not_parent_main_id]]
+    #ids of nestled multiples with non hierarchical measurements e.g. AC 
+    #component when A and B are closest and C further away can belong to
+    #several main_ids, those are left as they are
 
     wds_h_link=unique(wds_h_link) 
 
     #refs
-    wds_ident['id_ref']=[wds['provider']['provider_bibcode'][0] for j in range(len(wds_ident))]
-    wds_h_link['h_link_ref']=[wds['provider']['provider_bibcode'][0] for j in range(len(wds_h_link))]    
+    wds_bibcode=wds['provider']['provider_bibcode'][0]
+    wds_ident['id_ref']=np.full(len(wds_ident),wds_bibcode)
+    wds_h_link['h_link_ref']=np.full(len(wds_h_link),wds_bibcode)
     return wds_ident,wds_h_link
 
 def create_objects_table(wds_helptab,wds,test_objects):
@@ -269,10 +297,10 @@ def create_objects_table(wds_helptab,wds,test_objects):
     wds_objects=ids_from_ident(wds['ident']['main_id','id'],wds_objects)
     #if it has children, it is type system
     #if it has no children it can either be star or close in system
-    wds_objects['type']=['sy' for j in range(len(wds_objects))]
+    wds_objects['type']=np.full(len(wds_objects),'sy')
     #change to st for those that have no children
-    wds_objects['type'][np.invert(np.in1d(wds_objects['main_id'],wds['h_link']['parent_main_id']))]=['st' for j in range(len(
-            [np.invert(np.in1d(wds_objects['main_id'],wds['h_link']['parent_main_id']))]))] 
+    wds_objects['type'][np.invert(np.isin(wds_objects['main_id'],
+                                          wds['h_link']['parent_main_id']))]='st'
     
     if len(test_objects)>0:
         print('number of test objects that are in objects main_id \n', \
@@ -295,10 +323,10 @@ def create_mes_binary_table(wds_helptab,wds,test_objects):
     """
     wds_mes_binary=wds['objects']['main_id','type']#[np.where(wds_objects['type']=='sy')]
     wds_mes_binary.rename_column('type','binary_flag')
-    wds_mes_binary['binary_flag']=wds_mes_binary['binary_flag'].astype(object)
-    wds_mes_binary['binary_flag']=['True' for j in range(len(wds_mes_binary))]
-    wds_mes_binary['binary_ref']=[wds['provider']['provider_bibcode'][0] for j in range(len(wds_mes_binary))]
-    wds_mes_binary['binary_qual']=['C' for j in range(len(wds_mes_binary))]
+    wds_mes_binary['binary_flag']=np.full(len(wds_mes_binary),'True',dtype=object)
+    wds_mes_binary['binary_ref']=np.full(len(wds_mes_binary),
+                                         wds['provider']['provider_bibcode'][0])
+    wds_mes_binary['binary_qual']=np.full(len(wds_mes_binary),'C')
     
     if len(test_objects)>0:
         print('number of test objects that are in mes_binary main_id \n', \
@@ -328,27 +356,29 @@ def create_mes_sep_ang_table(wds_helptab,wds,test_objects):
       #          wds_ident['id']==wds['system_name'][masked_system_main_id][j])]
     wds_mes_sep_ang1=wds_mes_sep_ang0['main_id','wds_sep1','wds_obs1']
     wds_mes_sep_ang1.rename_columns(['wds_sep1','wds_obs1'],['sep_ang_value','sep_ang_obs_date'])
-    wds_mes_sep_ang1['sep_ang_qual']= \
-            ['C' if type(j)!=np.ma.core.MaskedConstant else 'E' for j in wds_mes_sep_ang1['sep_ang_obs_date']]
+    wds_mes_sep_ang1['sep_ang_qual']=np.where(
+            np.ma.getmaskarray(wds_mes_sep_ang1['sep_ang_obs_date']),'E','C')
     #issue, what if system_main_id is empty?
     
     
     wds_mes_sep_ang2=wds_mes_sep_ang0['main_id','wds_sep2','wds_obs2']
     wds_mes_sep_ang2.rename_columns(['wds_sep2','wds_obs2'],['sep_ang_value','sep_ang_obs_date'])
-    wds_mes_sep_ang2['sep_ang_qual']= \
-            ['B' if type(j)!=np.ma.core.MaskedConstant else 'E' for j in wds_mes_sep_ang2['sep_ang_obs_date']]
+    wds_mes_sep_ang2['sep_ang_qual']=np.where(
+            np.ma.getmaskarray(wds_mes_sep_ang2['sep_ang_obs_date']),'E','B')
     wds_mes_sep_ang=vstack([wds_mes_sep_ang1,wds_mes_sep_ang2])
     #add a quality to sep1 which is better than sep2. because newer measurements should be better.
-    wds_mes_sep_ang['sep_ang_ref']=[wds['provider']['provider_bibcode'][0] for j in range(len(wds_mes_sep_ang))]
+    wds_mes_sep_ang['sep_ang_ref']=np.full(len(wds_mes_sep_ang),
+                                           wds['provider']['provider_bibcode'][0])
     #wds_mes_sep_ang.rename_column('system_main_id','main_id')
-    #remove columns where sep_ang_value is masked
-    wds_mes_sep_ang.remove_columns(wds_mes_sep_ang['sep_ang_value'].mask.nonzero()[0])
+    #remove rows where sep_ang_value is masked
+    wds_mes_sep_ang=wds_mes_sep_ang[np.invert(
+            np.ma.getmaskarray(wds_mes_sep_ang['sep_ang_value']))]
     #uniqueness where obs date not known 
-    if len(wds_mes_sep_ang['sep_ang_obs_date'].mask.nonzero()[0])>0:
-        unique_unknown_obs_date=unique(wds_mes_sep_ang[np.where(
-                wds_mes_sep_ang['sep_ang_obs_date'].mask.nonzero()[0])],keys=['main_id','sep_ang_value'])
-        unique_known_obs_date=unique(wds_mes_sep_ang[np.where(
-                np.invert(wds_mes_sep_ang['sep_ang_obs_date'].mask.nonzero()[0]))],
+    unknown_obs_date=np.ma.getmaskarray(wds_mes_sep_ang['sep_ang_obs_date'])
+    if np.any(unknown_obs_date):
+        unique_unknown_obs_date=unique(wds_mes_sep_ang[unknown_obs_date],
+                                       keys=['main_id','sep_ang_value'])
+        unique_known_obs_date=unique(wds_mes_sep_ang[np.invert(unknown_obs_date)],
                 keys=['main_id','sep_ang_value','sep_ang_obs_date'])   
         wds_mes_sep_ang=vstack([unique_unknown_obs_date,unique_known_obs_date])
     else:
@@ -376,7 +406,7 @@ def create_wds_sources_table(wds):
                     wds['provider']['provider_name'][0])
     return wds_sources 
 
-def provider_wds(temp=False,test_objects=[]):
+def provider_wds(temp=False,test_objects=[],cache=False):
     """
     This function obtains and arranges wds data.
     
@@ -384,6 +414,9 @@ def provider_wds(temp=False,test_objects=[]):
     :param test_objects: Objects to be tested where they drop out of the 
         criteria or make it till the end.
     :type test_objects: list(str) 
+    :param cache: If True the query result is cached on disk and reused,
+        defaults to False.
+    :type cache: bool, optional
     :returns: List of astropy tables containing
         reference data, provider data, object data, identifier data, object to 
         object relation data, basic stellar data and binarity data.
@@ -394,7 +427,7 @@ def provider_wds(temp=False,test_objects=[]):
                             'http://tapvizier.u-strasbg.fr/TAPVizieR/tap',
                              '2001AJ....122.3466M')
 
-    wds_helptab = create_wds_helpertable(wds,temp,test_objects)
+    wds_helptab = create_wds_helpertable(wds,temp,test_objects,cache)
     wds['ident'],wds['h_link']=create_ident_and_h_link_table(wds_helptab,
                                                              wds,test_objects)    
     wds['objects']=create_objects_table(wds_helptab,wds,test_objects)
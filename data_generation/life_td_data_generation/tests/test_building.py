@@ -99,6 +99,51 @@ def test_best_para():
                  dtype=[object,float,object,float,int])
     assert len(setdiff(wanted_table,mes_table)) == 0
     
+def test_object_idrefs():
+    object_id_of_main_id={'*  61 Cyg A':1,'*  61 Cyg B':2}
+    
+    result=object_idrefs(['*  61 Cyg B','unknown','*  61 Cyg A'],
+                         object_id_of_main_id)
+    
+    assert list(result.data[~result.mask])==[2,1]
+    assert list(result.mask)==[False,True,False]
+    
+def test_quality_codes():
+    quals=MaskedColumn(data=['C','A','?','C','X','B'],
+                       mask=[False,False,False,False,False,True])
+    
+    result=quality_codes(quals)
+    
+    assert result.dtype==np.int8
+    assert list(result)==[2,0,5,2,6,6]
+    
+def test_main_id_codes():
+    basic_codes,best_codes=main_id_codes(['*  61 Cyg B','*  61 Cyg A'],
+                                         ['*  61 Cyg A','61 Cyg b','*  61 Cyg B'])
+    
+    assert list(basic_codes)==[1,0]
+    assert list(best_codes)==[0,2,1]
+    
+def test_best_para_of_merged_providers_with_equal_quality():
+    def mes_teff_st(values,source_idrefs):
+        return Table(data=[['*  61 Cyg A']*len(values),values,
+                           ['B']*len(values),[1e+20]*len(values),
+                           source_idrefs],
+                     names=['main_id','teff_st_value','teff_st_qual',
+                            'teff_st_err','teff_st_source_idref'], 
+                     dtype=[object,float,object,float,int])
+    prov_tables_dict={'sim':{'mes_teff_st':mes_teff_st([4440.0],[3])},
+                      'gaia':{'mes_teff_st':mes_teff_st([4192.0],[2])}}
+    cat={'mes_teff_st':Table()}
+    
+    cat=provider_data_merging(cat,'mes_teff_st',prov_tables_dict)
+    best_para_table=best_para('teff_st',cat['mes_teff_st'])
+    
+    #merged rows are sorted by all columns like the outer joins did, so 
+    #the lower value wins regardless of the provider order
+    assert list(best_para_table['teff_st_value'])==[4192.0]
+    assert list(best_para_table['teff_st_source_idref'])==[2]
+    
 #def test_building():
     #input_data=
     #building(prov_tables_list,table_names,list_of_tables)
@@ -11,3 +11,32 @@ def test_sim_queryable():
                 FROM basic """]
     sim=query(sim_provider['provider_url'][0],adql_query[0])
     assert type(sim)==type(Table())
+
+def test_stars_in_multiple_system():
+    cat=Table(data=[['sy1','sy2','sy3','sy4'],
+                    ['sy','sy','sy','sy'],
+                    ['M5V','K7V+M1V','G2V','M0V']],
+              names=['main_id','type','sptype_string'],
+              dtype=[object,object,object])
+    sim_h_link=Table(data=[['sy2a','sy3b','sy4b'],
+                           ['sy2','sy3','sy4'],
+                           ['ref','ref','ref']],
+                     names=['main_id','parent_main_id','h_link_ref'],
+                     dtype=[object,object,object])
+    all_objects=Table(data=[['sy1','sy2','sy3','sy4','sy2a','sy3b','sy4b'],
+                            ['sy','sy','sy','sy','st','pl','st']],
+                      names=['main_id','type'],
+                      dtype=[object,object])
+    
+    cat=stars_in_multiple_system(cat,sim_h_link,all_objects)
+    
+    #no children and single spectral type
+    assert cat['type'][0]=='st'
+    #'+' in spectral type
+    assert cat['type'][1]=='sy'
+    #only planetary children
+    assert cat['type'][2]=='st'
+    #stellar child
+    assert cat['type'][3]=='sy'
+    #input table is not altered
+    assert sim_h_link.colnames==['main_id','parent_main_id','h_link_ref']
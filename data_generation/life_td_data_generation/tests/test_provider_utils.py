@@ -1,6 +1,8 @@
 from provider.utils import *
-from astropy.table import Table
+from astropy.table import Table, MaskedColumn
 import numpy as np
+import os
+import pytest
 
 def test_create_provider_table_date_given():
     gk_provider = create_provider_table('Grant Kennedy Disks',
@@ -38,4 +40,109 @@ def test_query():
     upload_table=[table]
     table2=query(link,adql_query2,upload_table)
     
-    assert table2['child_main_id'][0]=='* alf Cen A'
\ No newline at end of file
+    assert table2['child_main_id'][0]=='* alf Cen A'
+def test_fetch_main_id_local_map():
+    local_map=Table(data=[['* alf Cen A','* alf Cen B','* alf Cen'],
+                          [1,2,3]],
+                    names=['main_id','oid'],
+                    dtype=[object,int])
+    cat=Table(data=[['* alf Cen A','* alf Cen B','not in map'],
+                    [3,3,4]],
+              names=['main_id','parent_oid'],
+              dtype=[object,int])
+    
+    result=fetch_main_id(cat,OidCreator(name='parent_main_id',
+                                        colname='parent_oid'),
+                         local_map=local_map)
+    
+    assert len(result)==2
+    assert list(result['parent_main_id'])==['* alf Cen','* alf Cen']
+    assert list(result['main_id'])==['* alf Cen A','* alf Cen B']
+
+def test_fill_sources_table():
+    cat=Table(data=[MaskedColumn(['ref1','ref2',''],mask=[False,False,True]),
+                    ['ref2','ref3','ref3']],
+              names=['coo_ref','plx_ref'],
+              dtype=[object,object])
+    old_sources=Table(data=[['ref1'],['other provider']],
+                      names=['ref','provider_name'])
+    
+    sources=fill_sources_table(cat,['coo_ref','plx_ref'],'provider',
+                               old_sources)
+    
+    assert len(sources)==4
+    assert list(sources['ref'][np.where(
+            sources['provider_name']=='provider')])==['ref1','ref2','ref3']
+
+def test_ids_from_ident():
+    ident=Table(data=[['* alf Cen B','* alf Cen A','* alf Cen B'],
+                      ['* alf Cen B','* alf Cen A','HD 128621']],
+                names=['main_id','id'],
+                dtype=[object,object])
+    objects=Table(names=['main_id','ids'],dtype=[object,object])
+    
+    result=ids_from_ident(ident,objects)
+    
+    assert list(result['main_id'])==['* alf Cen A','* alf Cen B']
+    assert list(result['ids'])==['* alf Cen A','* alf Cen B|HD 128621']
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_replace_value_list():
+    cat=Table(data=[['N','N/A','A'],[1.,2.,3.]],
+              names=['qual','value'],
+              dtype=[object,float])
+    
+    cat=replace_value(cat,'qual',['N','N/A'],'?')
+    cat=replace_value(cat,'value',['N','N/A'],'?')
+    
+    assert list(cat['qual'])==['?','?','A']
+    assert list(cat['value'])==[1.,2.,3.]
+
+def test_query_cache(tmp_path):
+    link='http://localhost/tap'
+    adql_query='SELECT main_id FROM basic'
+    cat=Table(data=[['* alf Cen A','* alf Cen B']],names=['main_id'])
+    cache_dir=str(tmp_path/'tap_cache')
+    
+    save_query_cache(cat,link,adql_query,cache_dir)
+    #the cached result is returned without contacting the service
+    result=query(link,adql_query,cache=True,cache_dir=cache_dir)
+    
+    assert os.path.exists(query_cache_path(link,adql_query,cache_dir))
+    assert list(result['main_id'])==['* alf Cen A','* alf Cen B']
+
+def test_unique_by_key():
+    cat=Table(data=[['* alf Cen B','* alf Cen A','* alf Cen B'],
+                    [1,2,3]],
+              names=['main_id','value'],
+              dtype=[object,int])
+    
+    result=unique_by_key(cat,'main_id')
+    
+    assert list(result['main_id'])==['* alf Cen A','* alf Cen B']
+    assert list(result['value'])==[2,1]
+
+def test_unique_rows():
+    cat=Table(data=[['* alf Cen B','* alf Cen A','* alf Cen B','* alf Cen B'],
+                    [1,2,1,3],
+                    MaskedColumn([1,2,3,4],mask=[False,True,False,False])],
+              names=['main_id','value','flag'],
+              dtype=[object,int,int])
+    
+    result=unique_rows(cat)
+    
+    #column flag contains masked values and is therefore no key
+    assert len(result)==len(unique(cat,silent=True))==3
+    assert list(result['main_id'])==['* alf Cen A','* alf Cen B','* alf Cen B']
+    assert list(result['value'])==[2,1,3]
+    assert list(result['flag'].mask)==[True,False,False]
+
+def test_unique_rows_nan():
+    cat=Table(data=[[np.nan,1.,np.nan,1.,np.nan],['b','a','b','a','a']],
+              names=['value','flag'])
+    
+    result=unique_rows(cat)
+    
+    #like in astropy unique rows containing NaN are never duplicates
+    assert len(result)==len(unique(cat,silent=True))==4
+    assert list(result['flag'])==['a','a','b','b']
@@ -3,8 +3,9 @@ Helper functions for the creation and analysis of the LIFE Target
     Database.
 """
 
-from numpy import dtype
 from astropy import io
+from astropy.table import Table
+from functools import lru_cache
 
 class Path:
     def __init__(self):
@@ -35,8 +36,10 @@ def save(cats,names,location=Path().additional_data):
                 #transform the type into string
                 cat[i] = cat[i].astype(str)
         #save the table
-        io.votable.writeto(
-        	    io.votable.from_table(cat), f'{location}{path}.xml')
+        cat.write(f'{location}{path}.xml',format='votable',
+                  tabledata_format='binary2',overwrite=True)
+    #previously loaded tables might be outdated now
+    _load_single.cache_clear()
     return
 
 def stringtoobject(cat,number=100):
@@ -48,19 +51,17 @@ def stringtoobject(cat,number=100):
     
     :param cat: Table with at least two columns
     :type cat: astropy.table.table.Table
-    :param int number: Length of longest string type element in the table.
-        Default is 100.
+    :param int number: Not used any longer, all string type columns are
+        transformed independent of their length. Kept for backwards
+        compatibility. Default is 100.
     :returns: Table with all string type columns transformed into object type ones.
     :rtype: astropy.table.table.Table
     """
     
-    # defining string types as calling them string does not work and 
-    # instead the type name <U3 is needed for a string of length 3
-    stringtypes=[dtype(f'<U{j}') for j in range(1,number)]
     #for each column header
     for i in cat.colnames:
-        #if the type of the column is string
-        if cat[i].dtype in stringtypes:
+        #if the type of the column is string (e.g. <U3 for length 3)
+        if cat[i].dtype.kind=='U':
             #transform the type into object
             cat[i] = cat[i].astype(object)
     return cat
@@ -70,7 +71,8 @@ def string_to_object_whole_dict(dictionary):
         dictionary[table_name] = stringtoobject(dictionary[table_name])
     return dictionary
 
-def load(paths,stringtoobjects=True,location=Path().additional_data):
+def load(paths,stringtoobjects=True,location=Path().additional_data,
+         columns=None):
     """    
     This function loads xml tables. 
     
@@ -81,6 +83,9 @@ def load(paths,stringtoobjects=True,location=Path().additional_data):
     :type stringtoobjects: bool
     :param location: Folder to save the file in, default is ../../data/additional_data/
     :type location: str
+    :param columns: For each file the names of the columns to be loaded,
+        defaults to None meaning all columns of all files.
+    :type columns: list(list(str))
     :returns: Loaded tables.
     :rtype: list(astropy.table.table.Table)
     """
@@ -88,12 +93,48 @@ def load(paths,stringtoobjects=True,location=Path().additional_data):
     #initialize return parameter as list
     cats=[]
     #go through all the elements in the paths list
-    for path in paths:
-        #read the saved data into the cats lists as astropy votable element
-        to_append=io.votable.parse_single_table(f'{location}{path}.xml')
-        cats.append(to_append.to_table())
+    for i,path in enumerate(paths):
+        #read the saved data into the cats lists as astropy table
+        if columns is None:
+            cats.append(Table.read(f'{location}{path}.xml',format='votable'))
+        else:
+            #only parsing the requested columns, the others are left empty
+            cat=Table.read(f'{location}{path}.xml',format='votable',
+                           columns=columns[i])
+            cats.append(cat[columns[i]])
     #go through all the tables in the cats list
     if stringtoobjects:
         for cat in cats:
             cat=stringtoobject(cat,3000)
-    return cats
\ No newline at end of file
+    return cats
+
+@lru_cache(maxsize=8)
+def _load_single(path,location,columns):
+    [cat]=load([path],location=location,
+               columns=None if columns is None else [list(columns)])
+    return cat
+
+def cached_load(paths,location=Path().additional_data,columns=None):
+    """
+    This function loads xml tables, parsing each file only once.
+    
+    Repeated calls return copies of the table parsed the first time. The
+    cache is emptied whenever save is called.
+    
+    :param paths: Filenames.
+    :type paths: list(str)
+    :param location: Folder of the files, default is ../../data/additional_data/
+    :type location: str
+    :param columns: For each file the names of the columns to be loaded,
+        defaults to None meaning all columns of all files.
+    :type columns: list(list(str))
+    :returns: Loaded tables.
+    :rtype: list(astropy.table.table.Table)
+    """
+    
+    if columns is None:
+        columns=[None for path in paths]
+    #lru_cache needs hashable arguments
+    return [_load_single(path,location,
+                         None if cols is None else tuple(cols)).copy()
+            for path,cols in zip(paths,columns)]